@@ -0,0 +1,275 @@
+import numpy as np
+import pandas as pd
+
+# Every DataAggregation report as (group keys, aggregations, sort column, head, rounding)
+REPORTS = {
+    'top_billing_by_age_medical_gender': (['Age Group', 'Medical Condition', 'Gender'], {'Billing Amount': 'mean'}, 'Billing Amount', 10, None),
+    'median_billing_by_admission_insurance': (['Admission Type', 'Insurance Provider'], {'Billing Amount': 'median'}, None, 10, None),
+    'patient_count_by_blood_age_gender': (['Blood Type', 'Age Group', 'Gender'], {'Patient Count': 'size'}, 'Patient Count', 10, None),
+    'mean_billing_room_by_age_admission': (['Age Group', 'Admission Type'], {'Billing Amount': 'mean', 'Room Number': 'mean'}, None, None, None),
+    'average_length_of_stay_by_age_gender': (['Age Group', 'Gender'], {'Length of Stay': 'mean'}, 'Length of Stay', 10, None),
+    'top_medications_by_medical_condition': (['Medical Condition', 'Medication'], {'Count': 'size'}, 'Count', 10, None),
+    'patient_count_by_medical_age_gender': (['Medical Condition', 'Age Group', 'Gender'], {'Patient Count': 'size'}, 'Patient Count', 10, None),
+    'avg_billing_by_admission_medical_gender': (['Admission Type', 'Medical Condition', 'Gender'], {'Billing Amount': 'mean'}, 'Billing Amount', 10, None),
+    'median_length_of_stay_by_age_insurance': (['Age Group', 'Insurance Provider'], {'Length of Stay': 'median'}, 'Length of Stay', 10, None),
+    'avg_billing_by_blood_age_gender': (['Blood Type', 'Age Group', 'Gender'], {'Billing Amount': 'mean'}, 'Billing Amount', 10, None),
+    'patient_count_by_admission_age_gender': (['Admission Type', 'Age Group', 'Gender'], {'Patient Count': 'size'}, 'Patient Count', 10, None),
+    'avg_billing_by_medication_age_gender': (['Medication', 'Age Group', 'Gender'], {'Billing Amount': 'mean'}, 'Billing Amount', 10, None),
+    'avg_length_of_stay_by_admission_age_gender': (['Admission Type', 'Age Group', 'Gender'], {'Length of Stay': 'mean'}, 'Length of Stay', 10, 0),
+}
+
+# Aggregations that can be rebuilt from per-group sum/count/size partials
+DECOMPOSABLE = {'mean', 'sum', 'count', 'size'}
+
+def finish_report(result: pd.DataFrame, sort_by, head, decimals) -> pd.DataFrame:
+    if sort_by is not None:
+        result = result.sort_values(ascending=False, by=sort_by)
+    if head is not None:
+        result = result.head(head)
+    if decimals is not None:
+        result[sort_by] = result[sort_by].round(decimals)
+    return result
+
+def combine_codes(codes, sizes) -> np.ndarray:
+    # Mixed-radix group id, ordered like a sorted multi-key groupby
+    group_ids = np.zeros(len(codes[0]), dtype=np.int64)
+    for code, size in zip(codes, sizes):
+        group_ids = group_ids * size + code
+    return group_ids
+
+def split_codes(group_ids, sizes):
+    codes = []
+    for size in reversed(sizes):
+        group_ids, code = np.divmod(group_ids, size)
+        codes.append(code)
+    return codes[::-1]
+
+def group_by_ids(group_ids, space):
+    # Dense bincount when the key space is small, sort-based unique otherwise
+    if space <= max(4 * len(group_ids), 1 << 20):
+        counts = np.bincount(group_ids, minlength=space)
+        uniques = np.flatnonzero(counts)
+        remap = np.zeros(space, dtype=np.int64)
+        remap[uniques] = np.arange(len(uniques))
+        return uniques, remap[group_ids]
+    return np.unique(group_ids, return_inverse=True)
+
+class AggregationEngine:
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self._keys = {}
+        self._bases = {}
+        self._derived = {}
+
+    def key(self, column):
+        # Factorize a key column once, missing values get the extra code len(uniques)
+        if column not in self._keys:
+            series = self.df[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy(dtype=np.int64)
+                n = len(series.cat.categories)
+                decode = lambda c, s=series: pd.Categorical.from_codes(c, dtype=s.dtype)
+            else:
+                codes, uniques = pd.factorize(series, sort=True)
+                codes = codes.astype(np.int64)
+                n = len(uniques)
+                decode = lambda c, u=uniques: u.take(c)
+            codes[codes < 0] = n
+            self._keys[column] = (codes, n + 1, decode)
+        return self._keys[column]
+
+    def plan(self, names):
+        # Pick the maximal key sets; every smaller decomposable set is derived from its smallest superset
+        key_sets = {frozenset(REPORTS[name][0]) for name in names
+                    if set(REPORTS[name][1].values()) <= DECOMPOSABLE}
+        bases = [s for s in key_sets if not any(s < other for other in key_sets)]
+        parents = {s: min((b for b in bases if s <= b), key=len) for s in key_sets}
+        values = {b: set() for b in bases}
+        for name in names:
+            keys, aggs = REPORTS[name][:2]
+            if frozenset(keys) in parents:
+                values[parents[frozenset(keys)]].update(col for col, how in aggs.items() if how != 'size')
+        return parents, values
+
+    def _base_partial(self, keys, values):
+        key_codes = [self.key(k) for k in keys]
+        sizes = [size for _, size, _ in key_codes]
+        uniques, inverse = group_by_ids(combine_codes([c for c, _, _ in key_codes], sizes), int(np.prod(sizes)))
+        partial = dict(zip(keys, split_codes(uniques, sizes)))
+        partial['size'] = np.bincount(inverse, minlength=len(uniques))
+        for col in values:
+            x = self.df[col].to_numpy(dtype='float64')
+            valid = ~np.isnan(x)
+            partial[(col, 'sum')] = np.bincount(inverse, weights=np.where(valid, x, 0.0), minlength=len(uniques))
+            partial[(col, 'count')] = np.bincount(inverse, weights=valid, minlength=len(uniques))
+        return partial
+
+    def _derive(self, base, keys):
+        # Re-aggregate a finer partial onto a subset of its keys
+        sizes = [self.key(k)[1] for k in keys]
+        uniques, inverse = group_by_ids(combine_codes([base[k] for k in keys], sizes), int(np.prod(sizes)))
+        partial = dict(zip(keys, split_codes(uniques, sizes)))
+        for name, column in base.items():
+            if name == 'size' or isinstance(name, tuple):
+                partial[name] = np.bincount(inverse, weights=column, minlength=len(uniques))
+        partial['size'] = partial['size'].astype(np.int64)
+        return partial
+
+    def _frame(self, keys, key_codes, columns):
+        # Groupby drops groups with a missing key
+        keep = np.ones(len(key_codes[0]), dtype=bool)
+        for k, codes in zip(keys, key_codes):
+            keep &= codes < self.key(k)[1] - 1
+        data = {k: self.key(k)[2](codes[keep]) for k, codes in zip(keys, key_codes)}
+        data.update({name: np.asarray(values)[keep] for name, values in columns.items()})
+        return pd.DataFrame(data)
+
+    def _decomposable(self, keys, aggs, base):
+        cache_key = (tuple(keys), base)
+        if cache_key not in self._derived:
+            self._derived[cache_key] = self._derive(self._bases[base], keys)
+        partial = self._derived[cache_key]
+        columns = {}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for name, how in aggs.items():
+                if how == 'size':
+                    columns[name] = partial['size']
+                elif how == 'mean':
+                    columns[name] = partial[(name, 'sum')] / partial[(name, 'count')]
+                else:
+                    columns[name] = partial[(name, how)]
+        return self._frame(keys, [partial[k] for k in keys], columns)
+
+    def _median(self, keys, aggs):
+        key_codes = [self.key(k) for k in keys]
+        sizes = [size for _, size, _ in key_codes]
+        group_ids = combine_codes([c for c, _, _ in key_codes], sizes)
+        medians = {name: self.df[name].groupby(group_ids).median() for name in aggs}
+        index = next(iter(medians.values())).index.to_numpy()
+        return self._frame(keys, split_codes(index, sizes), {name: m.to_numpy() for name, m in medians.items()})
+
+    def run(self, names=None) -> dict:
+        names = list(REPORTS) if names is None else list(names)
+        parents, values = self.plan(names)
+        for base, cols in values.items():
+            base = tuple(sorted(base))
+            cached = self._bases.get(base)
+            if cached is None or any((col, 'sum') not in cached for col in cols):
+                # One pass over the rows per maximal key set
+                self._bases[base] = self._base_partial(list(base), sorted(cols))
+                self._derived = {k: v for k, v in self._derived.items() if k[1] != base}
+        results = {}
+        for name in names:
+            keys, aggs, sort_by, head, decimals = REPORTS[name]
+            if frozenset(keys) in parents:
+                base = tuple(sorted(parents[frozenset(keys)]))
+                result = self._decomposable(keys, aggs, base)
+            else:
+                result = self._median(keys, aggs)
+            results[name] = finish_report(result, sort_by, head, decimals)
+        return results
+
+class AggregationStore:
+    def __init__(self, relative_accuracy: float = 0.01):
+        # Log-spaced buckets give medians within relative_accuracy of the true value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.rows = 0
+        self._partials = {}
+        self._sketches = {}
+        self._ordered = {}
+
+    @staticmethod
+    def _as_object_index(part):
+        return part.set_axis(pd.MultiIndex.from_frame(part.index.to_frame(index=False).astype(object)))
+
+    def _buckets(self, values: np.ndarray):
+        sign = np.sign(values)
+        bucket = np.zeros(len(values))
+        nonzero = values != 0
+        bucket[nonzero] = np.ceil(np.log(np.abs(values[nonzero])) / np.log(self.gamma))
+        return sign.astype(np.int64), bucket.astype(np.int64)
+
+    def append(self, df: pd.DataFrame):
+        partial_values, sketch_values = {}, {}
+        for keys, aggs, *_ in REPORTS.values():
+            keys = tuple(sorted(keys))
+            for col, how in aggs.items():
+                target = sketch_values if how == 'median' else partial_values
+                target.setdefault(keys, set())
+                if how != 'size':
+                    target[keys].add(col)
+
+        for keys, cols in partial_values.items():
+            grouped = df.groupby(list(keys), observed=True)
+            part = pd.DataFrame({'size': grouped.size()})
+            for col in sorted(cols):
+                part[f'{col}|sum'] = grouped[col].sum()
+                part[f'{col}|count'] = grouped[col].count()
+            part = self._as_object_index(part)
+            state = self._partials.get(keys)
+            self._partials[keys] = part if state is None else state.add(part, fill_value=0)
+
+        for keys, cols in sketch_values.items():
+            for col in cols:
+                values = df[col].to_numpy(dtype='float64')
+                valid = ~np.isnan(values)
+                sign, bucket = self._buckets(values[valid])
+                frame = df.loc[valid, list(keys)].assign(sign=sign, bucket=bucket)
+                counts = frame.groupby(list(keys) + ['sign', 'bucket'], observed=True).size()
+                counts = self._as_object_index(counts.to_frame('count'))['count']
+                state = self._sketches.get((keys, col))
+                self._sketches[(keys, col)] = counts if state is None else state.add(counts, fill_value=0)
+
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype) and df[column].dtype.ordered:
+                self._ordered[column] = df[column].dtype
+        self.rows += len(df)
+        return self
+
+    def _sorted(self, frame: pd.DataFrame, keys) -> pd.DataFrame:
+        # Match groupby ordering: ordered categoricals by rank, everything else lexically
+        for key in keys:
+            if key in self._ordered:
+                frame[key] = frame[key].astype(self._ordered[key])
+        return frame.sort_values(list(keys), kind='mergesort').reset_index(drop=True)
+
+    def _median(self, keys, col):
+        counts = self._sketches[(tuple(sorted(keys)), col)].reset_index()
+        counts['order'] = counts['sign'] * counts['bucket']
+        counts = counts.sort_values(list(keys) + ['sign', 'order'], kind='mergesort')
+        grouped = counts.groupby(list(keys), sort=False)
+        end = grouped['count'].cumsum()
+        start = end - counts['count']
+        total = grouped['count'].transform('sum')
+        value = counts['sign'] * 2 * self.gamma ** counts['bucket'] / (self.gamma + 1)
+        # Median is the mean of the values at ranks (n - 1) // 2 and n // 2
+        lower = value[(start <= (total - 1) // 2) & ((total - 1) // 2 < end)]
+        upper = value[(start <= total // 2) & (total // 2 < end)]
+        keyframe = counts[list(keys)]
+        lower = pd.concat([keyframe.loc[lower.index], lower.rename('lower')], axis=1)
+        upper = pd.concat([keyframe.loc[upper.index], upper.rename('upper')], axis=1)
+        merged = lower.merge(upper, on=list(keys))
+        merged[col] = (merged['lower'] + merged['upper']) / 2
+        return merged[list(keys) + [col]]
+
+    def report(self, name) -> pd.DataFrame:
+        keys, aggs, sort_by, head, decimals = REPORTS[name]
+        if set(aggs.values()) <= DECOMPOSABLE:
+            state = self._partials[tuple(sorted(keys))].reorder_levels(keys).reset_index()
+            result = state[keys].copy()
+            for col, how in aggs.items():
+                if how == 'size':
+                    result[col] = state['size'].astype(np.int64)
+                elif how == 'mean':
+                    result[col] = state[f'{col}|sum'] / state[f'{col}|count']
+                else:
+                    result[col] = state[f'{col}|{how}']
+        else:
+            result = None
+            for col in aggs:
+                median = self._median(keys, col)
+                result = median if result is None else result.merge(median, on=keys)
+        return finish_report(self._sorted(result, keys), sort_by, head, decimals)
+
+if __name__ == "__main__":
+    pass
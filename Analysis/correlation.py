@@ -0,0 +1,160 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from Preprocessing.caching import frame_fingerprint
+
+# Correlation matrices already computed in this process, keyed by dataset fingerprint and settings;
+# least recently used entries are dropped past CORRELATION_CACHE_SIZE
+CORRELATION_CACHE_SIZE = 32
+correlation_cache = OrderedDict()
+
+class CorrelationEngine:
+    def __init__(self, columns, block_size: int = 64, workers: int = None, dtype=np.float64):
+        # Sufficient statistics for pairwise-complete Pearson correlation: for every column pair
+        # the joint count and sums of x, x**2 and x*y over rows where both values are present.
+        # dtype=np.float32 halves chunk memory and matmul time, chunk results are summed in float64.
+        self.columns = list(columns)
+        self.block_size = block_size
+        self.workers = workers or os.cpu_count()
+        self.dtype = dtype
+        p = len(self.columns)
+        self.shift = None
+        self.n = np.zeros((p, p))
+        self.sx = np.zeros((p, p))
+        self.sxx = np.zeros((p, p))
+        self.sxy = np.zeros((p, p))
+
+    def _blocks(self):
+        starts = range(0, len(self.columns), self.block_size)
+        blocks = [slice(start, start + self.block_size) for start in starts]
+        return [(a, b) for i, a in enumerate(blocks) for b in blocks[i:]]
+
+    def update(self, chunk: pd.DataFrame):
+        X = chunk[self.columns].to_numpy(dtype=np.float64)
+        if self.shift is None:
+            # Shifting by the first chunk's means keeps the sums small and the subtraction stable
+            self.shift = np.nan_to_num(np.nanmean(X, axis=0)) if len(X) else np.zeros(len(self.columns))
+        X = X - self.shift
+        valid = ~np.isnan(X)
+        complete = bool(valid.all())
+        X = np.where(valid, X, 0).astype(self.dtype)
+        X2 = X * X
+        M = valid.astype(self.dtype)
+        n, sx, sxx, sxy = (np.zeros_like(self.n) for _ in range(4))
+
+        def block(pair):
+            a, b = pair
+            sxy[a, b] = X[:, a].T @ X[:, b]
+            if complete:
+                # No missing values: joint counts and sums are the plain column totals
+                n[a, b] = len(X)
+                sx[a, b] = X[:, a].sum(axis=0, dtype=np.float64)[:, None]
+                sx[b, a] = X[:, b].sum(axis=0, dtype=np.float64)[:, None]
+                sxx[a, b] = X2[:, a].sum(axis=0, dtype=np.float64)[:, None]
+                sxx[b, a] = X2[:, b].sum(axis=0, dtype=np.float64)[:, None]
+            else:
+                n[a, b] = M[:, a].T @ M[:, b]
+                sx[a, b] = X[:, a].T @ M[:, b]
+                sx[b, a] = X[:, b].T @ M[:, a]
+                sxx[a, b] = X2[:, a].T @ M[:, b]
+                sxx[b, a] = X2[:, b].T @ M[:, a]
+
+        # Column block pairs are independent and the matmuls release the GIL, so threads run them in parallel
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            list(pool.map(block, self._blocks()))
+        # Only the upper block triangle of the symmetric statistics was computed
+        upper = np.triu(np.ones(n.shape, dtype=bool))
+        self.n += np.where(upper, n, n.T)
+        self.sxy += np.where(upper, sxy, sxy.T)
+        self.sx += sx
+        self.sxx += sxx
+        return self
+
+    def merge(self, other: 'CorrelationEngine'):
+        # Partial engines from other chunks or processes; their sums are moved onto this engine's shift
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift
+        d = other.shift - self.shift
+        self.n += other.n
+        self.sxx += other.sxx + 2 * d[:, None] * other.sx + other.n * (d ** 2)[:, None]
+        self.sxy += other.sxy + d[:, None] * other.sx.T + d[None, :] * other.sx + other.n * np.outer(d, d)
+        self.sx += other.sx + other.n * d[:, None]
+        return self
+
+    def matrix(self) -> pd.DataFrame:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sy, syy = self.sx.T, self.sxx.T
+            cov = self.sxy - self.sx * sy / self.n
+            var_x = self.sxx - self.sx ** 2 / self.n
+            var_y = syy - sy ** 2 / self.n
+            corr = cov / np.sqrt(var_x * var_y)
+        corr = np.clip(corr, -1, 1)
+        np.fill_diagonal(corr, np.where(np.diag(var_x) > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+def rank_sample(chunks, columns, sample_size: int = 100_000, seed: int = 0) -> np.ndarray:
+    # Bottom-k sample over all chunks: every row gets a random key and the k smallest keys are kept
+    rng = np.random.default_rng(seed)
+    keys, rows = np.empty(0), np.empty((0, len(columns)))
+    for chunk in chunks:
+        values = chunk[columns].to_numpy(dtype=np.float64)
+        keys = np.concatenate([keys, rng.random(len(values))])
+        rows = np.concatenate([rows, values])
+        keep = np.argsort(keys, kind='stable')[:sample_size]
+        keys, rows = keys[keep], rows[keep]
+    return np.sort(rows, axis=0)
+
+def approximate_ranks(chunk: pd.DataFrame, columns, sorted_sample: np.ndarray) -> pd.DataFrame:
+    # Mid-rank of each value within the sample, an estimate of its rank in the full column
+    ranks = {}
+    for i, column in enumerate(columns):
+        reference = sorted_sample[:, i][~np.isnan(sorted_sample[:, i])]
+        values = chunk[column].to_numpy(dtype=np.float64)
+        rank = (np.searchsorted(reference, values, side='left') + np.searchsorted(reference, values, side='right')) / 2
+        ranks[column] = np.where(np.isnan(values), np.nan, rank)
+    return pd.DataFrame(ranks, index=chunk.index)
+
+def correlation_matrix(data, method: str = 'pearson', block_size: int = 64, workers: int = None,
+                       dtype=np.float64, sample_size: int = 100_000, cache_dir: str = None) -> pd.DataFrame:
+    # data is a DataFrame, or for frames that do not fit in memory a zero-argument callable returning
+    # a fresh iterator of chunks (Spearman needs two passes: one to sample ranks, one to correlate them)
+    if isinstance(data, pd.DataFrame):
+        data = data.select_dtypes(include=['number'])
+        key = f"{frame_fingerprint(data)}-{method}-{np.dtype(dtype).name}"
+        if key in correlation_cache:
+            correlation_cache.move_to_end(key)
+            return correlation_cache[key]
+        path = None if cache_dir is None else os.path.join(cache_dir, f"{key}.pkl")
+        if path is not None and os.path.exists(path):
+            corr = pd.read_pickle(path)
+        else:
+            columns = list(data.columns)
+            if method == 'spearman':
+                # Average ranks per column; matches DataFrame.corr('spearman') when there are no missing values
+                data = data.rank()
+            corr = CorrelationEngine(columns, block_size, workers, dtype).update(data).matrix()
+            if path is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                corr.to_pickle(path)
+        correlation_cache[key] = corr
+        while len(correlation_cache) > CORRELATION_CACHE_SIZE:
+            correlation_cache.popitem(last=False)
+        return corr
+
+    columns = list(next(iter(data())).select_dtypes(include=['number']).columns)
+    engine = CorrelationEngine(columns, block_size, workers, dtype)
+    if method == 'spearman':
+        sample = rank_sample(data(), columns, sample_size)
+        for chunk in data():
+            engine.update(approximate_ranks(chunk, columns, sample))
+    else:
+        for chunk in data():
+            engine.update(chunk)
+    return engine.matrix()
+
+if __name__ == "__main__":
+    pass
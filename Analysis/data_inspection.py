@@ -1,4 +1,5 @@
 import pandas as pd
+from Analysis.profiling import Profile, profile_chunks
 from abc import ABC, abstractmethod
 
 class DataInspection(ABC):
@@ -16,7 +17,7 @@ class SummaryStatistics(DataInspection):
 
 class DescriptiveStatistics(DataInspection):
     def data_inspection(self, df: pd.DataFrame) -> pd.DataFrame:
-        df = df.select_dtypes(include=['int64', 'float64'])
+        df = df.select_dtypes(include=['number'])
         desc = pd.DataFrame()
         desc['Sample Count'] = df.count()
         desc['Missing Values'] = df.isnull().sum()
@@ -25,6 +26,24 @@ class DescriptiveStatistics(DataInspection):
         desc = desc.join(df.describe().T.drop(columns='count'))
         return desc 
 
+class ProfileStatistics(DataInspection):
+    def __init__(self, exact_rows: int = 1_000_000, relative_accuracy: float = 0.01, precision: int = 14):
+        # Frames up to exact_rows are profiled exactly, larger ones with mergeable sketches
+        self.exact_rows = exact_rows
+        self.relative_accuracy = relative_accuracy
+        self.precision = precision
+
+    def _options(self, exact: bool) -> dict:
+        return {'exact': exact, 'relative_accuracy': self.relative_accuracy, 'precision': self.precision}
+
+    def data_inspection(self, df) -> pd.DataFrame:
+        # Same table as DescriptiveStatistics from a single pass; also accepts an iterable of chunks
+        if isinstance(df, pd.DataFrame):
+            self.profile_ = Profile(**self._options(len(df) <= self.exact_rows)).update(df)
+        else:
+            self.profile_ = profile_chunks(df, **self._options(False))
+        return self.profile_.report()
+
 class DataInspectionFactory:
     def __init__(self, strategy: DataInspection):
         self.strategy = strategy
@@ -1,25 +1,45 @@
 from abc import ABC, abstractmethod
+import numpy as np
 import pandas as pd
+from Preprocessing.caching import StageCache, run_stage
 
 class DataFixer(ABC):
     @abstractmethod
     def data_fixing(self, df: pd.DataFrame):
         pass
 
+def _normalize_categories(series: pd.Series, normalize) -> pd.Categorical:
+    # Apply a string normalizer to the distinct values only, then remap the codes
+    cat = pd.Categorical(series)
+    normalized = normalize(pd.Series(cat.categories, dtype=object))
+    categories = pd.Index(np.sort(normalized.unique()))
+    remap = np.append(categories.get_indexer(normalized), -1)
+    return pd.Categorical.from_codes(remap[cat.codes], categories=categories)
+
 class Preparation(DataFixer):
-    def data_fixing(self, df: pd.DataFrame):
-        def categorize_age(age):
-            if age < 20:
-                return 'Children/Teenagers'
-            elif 20 <= age < 40:
-                return 'Young Adults'
-            elif 40 <= age < 60:
-                return 'Middle-aged Adults'
-            else:
-                return 'Seniors'
+    def __init__(self,
+                 age_bins=(20, 40, 60),
+                 age_labels=('Children/Teenagers', 'Young Adults', 'Middle-aged Adults', 'Seniors'),
+                 billing_bins=(1000, 5000, 10000),
+                 billing_labels=('Low', 'Medium', 'High', 'Very High')):
+        self.age_bins = age_bins
+        self.age_labels = age_labels
+        self.billing_bins = billing_bins
+        self.billing_labels = billing_labels
 
-        
-        df['Age Group'] = df['Age'].apply(categorize_age)
+    @staticmethod
+    def _categorize(values: pd.Series, bins, labels) -> pd.Categorical:
+        # Left-closed bins: a value equal to an edge falls into the higher bin, and a missing value into the
+        # last one, as the former if/else chain did. Categories are sorted by name so groupby keys come out
+        # in the same order as they did for the plain string column
+        codes = np.searchsorted(np.asarray(bins, dtype=np.float64),
+                                values.to_numpy(dtype=np.float64, na_value=np.nan), side='right')
+        labels = np.asarray(labels, dtype=object)
+        categories = pd.Index(np.sort(labels))
+        return pd.Categorical.from_codes(categories.get_indexer(labels)[codes], categories=categories)
+
+    def data_fixing(self, df: pd.DataFrame):
+        df['Age Group'] = self._categorize(df['Age'], self.age_bins, self.age_labels)
         
         # Length of Stay calculation
         df['Date of Admission'] = pd.to_datetime(df['Date of Admission'], errors='coerce')
@@ -27,35 +47,70 @@ class Preparation(DataFixer):
         df['Length of Stay'] = (df['Discharge Date'] - df['Date of Admission']).dt.days
         
         # Billing Amount categorization
-        def categorize_billing(amount):
-            if amount < 1000:
-                return 'Low'
-            elif 1000 <= amount < 5000:
-                return 'Medium'
-            elif 5000 <= amount < 10000:
-                return 'High'
-            else:
-                return 'Very High'
-        
-        df['Billing Category'] = df['Billing Amount'].apply(categorize_billing)
+        df['Billing Category'] = self._categorize(df['Billing Amount'], self.billing_bins, self.billing_labels)
         
         # Standardizing Gender format
-        df['Gender'] = df['Gender'].str.capitalize()
+        df['Gender'] = _normalize_categories(df['Gender'], lambda s: s.str.capitalize())
         
         # Standardizing Insurance Provider format
-        df['Insurance Provider'] = df['Insurance Provider'].str.strip().str.title()
+        df['Insurance Provider'] = _normalize_categories(df['Insurance Provider'], lambda s: s.str.strip().str.title())
         
         # Standardizing Admission Type format
-        df['Admission Type'] = df['Admission Type'].str.title()
+        df['Admission Type'] = _normalize_categories(df['Admission Type'], lambda s: s.str.title())
         
         return df
 
 class PreparationFactory:
-    def __init__(self, strategy : DataFixer):
+    def __init__(self, strategy : DataFixer, cache: StageCache = None):
         self.strategy = strategy
+        self.cache = cache
 
     def prepare(self, df : pd.DataFrame):
-        return self.strategy.data_fixing(df)
+        return run_stage(self.cache, self.strategy, 'data_fixing', df)
     
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    import time
+
+    # Benchmark: the previous row-wise apply implementation versus the vectorized Preparation
+    def row_wise(df):
+        df['Age Group'] = df['Age'].apply(
+            lambda a: 'Children/Teenagers' if a < 20 else 'Young Adults' if a < 40
+            else 'Middle-aged Adults' if a < 60 else 'Seniors')
+        df['Date of Admission'] = pd.to_datetime(df['Date of Admission'], errors='coerce')
+        df['Discharge Date'] = pd.to_datetime(df['Discharge Date'], errors='coerce')
+        df['Length of Stay'] = (df['Discharge Date'] - df['Date of Admission']).dt.days
+        df['Billing Category'] = df['Billing Amount'].apply(
+            lambda b: 'Low' if b < 1000 else 'Medium' if b < 5000 else 'High' if b < 10000 else 'Very High')
+        df['Gender'] = df['Gender'].str.capitalize()
+        df['Insurance Provider'] = df['Insurance Provider'].str.strip().str.title()
+        df['Admission Type'] = df['Admission Type'].str.title()
+        return df
+
+    rng = np.random.default_rng(0)
+    n_rows = 2_000_000
+    admission = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, n_rows), unit='D')
+    data = pd.DataFrame({
+        # Missing ages and amounts fall into the last bin, as they did in the row-wise version
+        'Age': np.where(rng.random(n_rows) < 0.01, np.nan, rng.integers(0, 90, n_rows)),
+        'Billing Amount': np.where(rng.random(n_rows) < 0.01, np.nan, rng.uniform(0, 50000, n_rows)),
+        'Gender': rng.choice(['male', 'Female'], n_rows),
+        'Insurance Provider': rng.choice([' aetna', 'Cigna ', 'Medicare'], n_rows),
+        'Admission Type': rng.choice(['urgent', 'Emergency', 'elective'], n_rows),
+        'Date of Admission': admission.strftime('%Y-%m-%d'),
+        'Discharge Date': (admission + pd.Timedelta(days=3)).strftime('%Y-%m-%d'),
+    })
+
+    start = time.perf_counter()
+    legacy = row_wise(data.copy())
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fixed = Preparation().data_fixing(data.copy())
+    vectorized_time = time.perf_counter() - start
+
+    pd.testing.assert_frame_equal(fixed.astype(str), legacy.astype(str))
+    # Grouped reports list their keys in the same order as before
+    for key in ['Age Group', 'Billing Category']:
+        assert list(fixed.groupby(key, observed=True).size().index) == list(legacy.groupby(key).size().index)
+    print(f"row-wise:   {n_rows / legacy_time:,.0f} rows/sec")
+    print(f"vectorized: {n_rows / vectorized_time:,.0f} rows/sec")
@@ -1,8 +1,14 @@
+import re
+from collections import Counter, defaultdict
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
 import matplotlib.pyplot as plt
 import seaborn as sns
 from wordcloud import WordCloud as WC
+from wordcloud.tokenization import score as collocation_score
+from Analysis.summaries import category_counts, draw_counts
+from Preprocessing.caching import frame_fingerprint
 
 class MedConDataVisualization(ABC):
     @abstractmethod
@@ -10,14 +16,78 @@ class MedConDataVisualization(ABC):
         pass
 
 class WordCloud(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df = df['Medical Condition']
-        wordcloud = WC().generate(' '.join(df.astype(str)))  
+    def visualize(self, df):
+        # df can also be an iterable of chunks, e.g. pd.read_csv(..., chunksize=...)
+        wordcloud = WC().generate_from_frequencies(self.frequencies(df))
         plt.figure(figsize=(15, 5))
         plt.imshow(wordcloud, interpolation='bilinear')
         plt.axis("off")
         plt.show()
 
+    @staticmethod
+    def _words(text: str, wc: WC) -> list:
+        # The token rules of WC.process_text, up to (not including) stopword removal
+        pattern = wc.regexp or (r"\w[\w']*" if wc.min_word_length <= 1 else r"\w[\w']+")
+        words = [word[:-2] if word.lower().endswith("'s") else word for word in re.findall(pattern, text)]
+        if not wc.include_numbers:
+            words = [word for word in words if not word.isdigit()]
+        return [word for word in words if len(word) >= wc.min_word_length] if wc.min_word_length else words
+
+    @staticmethod
+    def _merge_forms(weights: dict, normalize_plurals: bool):
+        # process_tokens with a weight per token instead of one entry per occurrence
+        cases = defaultdict(Counter)
+        for word, weight in weights.items():
+            cases[word.lower()][word] += weight
+        plurals = {}
+        if normalize_plurals:
+            for key in list(cases):
+                if key.endswith('s') and not key.endswith('ss') and key[:-1] in cases:
+                    for word, weight in cases.pop(key).items():
+                        cases[key[:-1]][word[:-1]] += weight
+                    plurals[key] = key[:-1]
+        counts, standard = {}, {}
+        for key, forms in cases.items():
+            first = max(forms.items(), key=lambda item: item[1])[0]
+            counts[first] = sum(forms.values())
+            standard[key] = first
+        standard.update({plural: standard[singular] for plural, singular in plurals.items()})
+        return counts, standard
+
+    @classmethod
+    def frequencies(cls, df) -> dict:
+        chunks = [df] if isinstance(df, pd.DataFrame) else df
+        counts = Counter()
+        for chunk in chunks:
+            counts.update(chunk['Medical Condition'].astype(str).value_counts().to_dict())
+
+        # WordCloud's unigram/bigram collocation rules on each distinct value, weighted by its count.
+        # Bigrams inside a value (e.g. "Heart Disease") are kept like generate() keeps them; bigrams that
+        # only arise from joining neighbouring rows depend on row order and are left out.
+        wc = WC()
+        stopwords = {word.lower() for word in wc.stopwords}
+        unigrams, bigrams = Counter(), Counter()
+        for value, count in counts.items():
+            words = cls._words(value, wc)
+            for word in words:
+                if word.lower() not in stopwords:
+                    unigrams[word] += count
+            for pair in zip(words, words[1:]):
+                if not any(word.lower() in stopwords for word in pair):
+                    bigrams[' '.join(pair)] += count
+        word_counts, standard = cls._merge_forms(unigrams, wc.normalize_plurals)
+        if not wc.collocations:
+            return word_counts
+        bigram_counts, _ = cls._merge_forms(bigrams, wc.normalize_plurals)
+        totals, n_words = dict(word_counts), sum(unigrams.values())
+        for bigram, count in bigram_counts.items():
+            first, second = (standard[word.lower()] for word in bigram.split(' '))
+            if collocation_score(count, totals[first], totals[second], n_words) > wc.collocation_threshold:
+                word_counts[first] -= count
+                word_counts[second] -= count
+                word_counts[bigram] = count
+        return {word: count for word, count in word_counts.items() if count > 0}
+
 class MedicalCondition(MedConDataVisualization):
     def visualize(self, df : pd.DataFrame):
         df = df[['Gender', 'Medical Condition', 'Age Group']]
@@ -35,108 +105,123 @@ class MedicalCondition(MedConDataVisualization):
         plt.tight_layout()
         plt.show()
 
-class Cancer(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Cancer']
-        
-        cat = sns.catplot(data=df_smokers, 
-                    x='Age Group', 
-                    hue='Gender', 
-                    kind='count', 
-                    height=4, 
-                    aspect=2)
-        cat._legend.remove() #remove default legend
-        cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Cancer Distribution by Age Group and Gender')
-        cat.set_axis_labels('Age Group', 'Count of Medical Condition')
-        plt.tight_layout()
-        plt.show()
+class SummaryMedicalCondition(MedConDataVisualization):
+    # Same figure as MedicalCondition, drawn from per-category counts instead of rows
+    def __init__(self, sample: int = None, seed: int = 0):
+        self.sample = sample
+        self.seed = seed
+        self.bounds_ = {}
 
-class Arthritis(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Arthritis']
-        
-        cat = sns.catplot(data=df_smokers, 
-                    x='Age Group', 
-                    hue='Gender', 
-                    kind='count', 
-                    height=4, 
-                    aspect=2)
-        cat._legend.remove() 
-        cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Arthritis Distribution by Age Group and Gender')
-        cat.set_axis_labels('Age Group', 'Count of Medical Condition')
+    def visualize(self, df : pd.DataFrame):
+        df = df[['Gender', 'Medical Condition', 'Age Group']]
+        numerical_columns = df.columns
+        num_columns = len(numerical_columns)
+        numerical_rows = (num_columns + num_columns - 1) // num_columns
+        fig, axes = plt.subplots(nrows=numerical_rows, ncols=num_columns, figsize=(20, 5 * numerical_rows))
+        axes = axes.flatten()
+        for i, column in enumerate(df.columns):
+            labels, counts, self.bounds_[column] = category_counts(df[column], self.sample, self.seed)
+            draw_counts(axes[i], labels, counts, column)
+            axes[i].set_title(f"Countplot of {column}")
+            axes[i].set_xticklabels(axes[i].get_xticklabels(), rotation=45)
+        for j in range(i+1, len(axes)):
+            fig.delaxes(axes[j])
         plt.tight_layout()
         plt.show()
 
-class Diabetes(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Diabetes']
-        
-        cat = sns.catplot(data=df_smokers, 
-                    x='Age Group', 
-                    hue='Gender', 
-                    kind='count', 
-                    height=4, 
-                    aspect=2)
-        cat._legend.remove() 
-        cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Diabetes Distribution by Age Group and Gender')
-        cat.set_axis_labels('Age Group', 'Count of Medical Condition')
-        plt.tight_layout()
-        plt.show()
+# One Medical Condition x Age Group x Gender count cube per frame content, shared by every condition chart.
+# Keyed by a fingerprint of the three columns, so an in-place edit gives a new cube.
+_cube_cache = {}
 
-class Hypertension(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Hypertension']
-        
-        cat = sns.catplot(data=df_smokers, 
-                    x='Age Group', 
-                    hue='Gender', 
-                    kind='count', 
-                    height=4, 
-                    aspect=2)
-        cat._legend.remove() 
-        cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Hypertension Distribution by Age Group and Gender')
-        cat.set_axis_labels('Age Group', 'Count of Medical Condition')
-        plt.tight_layout()
-        plt.show()
+def condition_cube(df: pd.DataFrame) -> pd.DataFrame:
+    keys = ['Medical Condition', 'Age Group', 'Gender']
+    key = frame_fingerprint(df[keys])
+    if key in _cube_cache:
+        return _cube_cache[key]
+    # Single groupby for every count, plus each group's first row to keep seaborn's order of appearance
+    cube = (df[keys].assign(_row=np.arange(len(df)))
+            .groupby(keys, observed=True, sort=False)['_row']
+            .agg(Count='size', first_row='min')
+            .reset_index())
+    _cube_cache.clear()
+    _cube_cache[key] = cube
+    return cube
 
-class Obesity(MedConDataVisualization):
-    def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Obesity']
-        
-        cat = sns.catplot(data=df_smokers, 
-                    x='Age Group', 
-                    hue='Gender', 
-                    kind='count', 
-                    height=4, 
-                    aspect=2)
-        cat._legend.remove() 
-        cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Obesity Distribution by Age Group and Gender')
-        cat.set_axis_labels('Age Group', 'Count of Medical Condition')
-        plt.tight_layout()
-        plt.show()
+def _category_order(df: pd.DataFrame, cube: pd.DataFrame, column: str):
+    if isinstance(df[column].dtype, pd.CategoricalDtype):
+        return list(df[column].cat.categories)
+    return list(cube.groupby(column, observed=True)['first_row'].min().sort_values().index)
+
+class ConditionDistribution(MedConDataVisualization):
+    condition = None
+
+    def __init__(self, condition: str = None, small_multiples: bool = False, col_wrap: int = 3):
+        if condition is not None:
+            self.condition = condition
+        self.small_multiples = small_multiples
+        self.col_wrap = col_wrap
 
-class Asthma(MedConDataVisualization):
     def visualize(self, df: pd.DataFrame):
-        df_smokers = df[df['Medical Condition'] == 'Asthma']
-        
-        cat = sns.catplot(data=df_smokers, 
+        cube = condition_cube(df)
+        if self.small_multiples or self.condition is None:
+            # Every condition at once, one panel per condition
+            data = cube
+            order = _category_order(df, data, 'Age Group')
+            hue_order = _category_order(df, data, 'Gender')
+            conditions = _category_order(df, data, 'Medical Condition')
+            cat = sns.catplot(data=data, x='Age Group', y='Count', hue='Gender', col='Medical Condition',
+                              col_order=conditions, col_wrap=self.col_wrap, order=order, hue_order=hue_order,
+                              kind='bar', errorbar=None, height=4, aspect=1.5)
+            if cat._legend is not None:
+                cat._legend.remove()
+            cat.add_legend(title='Gender', loc='upper left', bbox_to_anchor=(1, 1))
+            cat.set_titles('{col_name}')
+            cat.set_axis_labels('Age Group', 'Count of Medical Condition')
+            for ax in cat.axes.flat:
+                ax.tick_params(axis='x', rotation=45)
+            plt.tight_layout()
+            plt.show()
+            return
+
+        data = cube[cube['Medical Condition'] == self.condition]
+        if data.empty:
+            raise ValueError(f"No rows with Medical Condition '{self.condition}'")
+        cat = sns.catplot(data=data, 
                     x='Age Group', 
+                    y='Count',
                     hue='Gender', 
-                    kind='count', 
+                    order=_category_order(df, data, 'Age Group'),
+                    hue_order=_category_order(df, data, 'Gender'),
+                    kind='bar', 
+                    errorbar=None,
                     height=4, 
                     aspect=2)
-        cat._legend.remove() 
+        if cat._legend is not None:
+            cat._legend.remove() #remove default legend
         cat.add_legend(title='Gender',loc='upper left', bbox_to_anchor=(1, 1)) 
-        plt.title('Asthma Distribution by Age Group and Gender')
+        plt.title(f'{self.condition} Distribution by Age Group and Gender')
         cat.set_axis_labels('Age Group', 'Count of Medical Condition')
         plt.tight_layout()
         plt.show()
 
+class Cancer(ConditionDistribution):
+    condition = 'Cancer'
+
+class Arthritis(ConditionDistribution):
+    condition = 'Arthritis'
+
+class Diabetes(ConditionDistribution):
+    condition = 'Diabetes'
+
+class Hypertension(ConditionDistribution):
+    condition = 'Hypertension'
+
+class Obesity(ConditionDistribution):
+    condition = 'Obesity'
+
+class Asthma(ConditionDistribution):
+    condition = 'Asthma'
+
 class MedConVisualizationFactory:
     def __init__(self, strategy: MedConDataVisualization):
         self.strategy = strategy
@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from abc import ABC, abstractmethod
+from Analysis.aggregation import AggregationEngine, AggregationStore, REPORTS, DECOMPOSABLE
+from Analysis.correlation import correlation_matrix
 
 class MultivariateAnalysis(ABC):
     @abstractmethod
@@ -12,71 +15,153 @@ class DataAggregation(MultivariateAnalysis):
     def multivariate_analysis(self, df: pd.DataFrame):
         self.df = df
 
+    def report(self, names=None) -> dict:
+        # All requested aggregations planned together over shared factorized keys
+        return AggregationEngine(self.df).run(names)
+
     def top_billing_by_age_medical_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Age Group', 'Medical Condition', 'Gender']).agg({
+        return self.df.groupby(['Age Group', 'Medical Condition', 'Gender'], observed=True).agg({
             'Billing Amount': 'mean'
         }).reset_index().sort_values(ascending=False, by='Billing Amount').head(10)
 
     def median_billing_by_admission_insurance(self) -> pd.DataFrame:
-        return self.df.groupby(['Admission Type', 'Insurance Provider']).agg({
+        return self.df.groupby(['Admission Type', 'Insurance Provider'], observed=True).agg({
             'Billing Amount': 'median'
         }).reset_index().head(10)
 
     def patient_count_by_blood_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Blood Type', 'Age Group', 'Gender']).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
+        return self.df.groupby(['Blood Type', 'Age Group', 'Gender'], observed=True).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
 
     def mean_billing_room_by_age_admission(self) -> pd.DataFrame:
-        return self.df.groupby(['Age Group', 'Admission Type']).agg({
+        return self.df.groupby(['Age Group', 'Admission Type'], observed=True).agg({
             'Billing Amount': 'mean',
             'Room Number': 'mean'
         }).reset_index()
 
     def average_length_of_stay_by_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Age Group', 'Gender']).agg({
+        return self.df.groupby(['Age Group', 'Gender'], observed=True).agg({
             'Length of Stay': 'mean'
         }).reset_index().sort_values(ascending=False, by='Length of Stay').head(10)
 
     def top_medications_by_medical_condition(self) -> pd.DataFrame:
-        return self.df.groupby(['Medical Condition', 'Medication']).size().reset_index(name='Count').sort_values(by='Count', ascending=False).head(10)
+        return self.df.groupby(['Medical Condition', 'Medication'], observed=True).size().reset_index(name='Count').sort_values(by='Count', ascending=False).head(10)
 
     def patient_count_by_medical_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Medical Condition', 'Age Group', 'Gender']).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
+        return self.df.groupby(['Medical Condition', 'Age Group', 'Gender'], observed=True).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
 
     def avg_billing_by_admission_medical_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Admission Type', 'Medical Condition', 'Gender']).agg({
+        return self.df.groupby(['Admission Type', 'Medical Condition', 'Gender'], observed=True).agg({
             'Billing Amount': 'mean'
         }).reset_index().sort_values(ascending=False, by='Billing Amount').head(10)
 
     def median_length_of_stay_by_age_insurance(self) -> pd.DataFrame:
-        return self.df.groupby(['Age Group', 'Insurance Provider']).agg({
+        return self.df.groupby(['Age Group', 'Insurance Provider'], observed=True).agg({
             'Length of Stay': 'median'
         }).reset_index().sort_values(ascending=False, by='Length of Stay').head(10)
 
     def avg_billing_by_blood_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Blood Type', 'Age Group', 'Gender']).agg({
+        return self.df.groupby(['Blood Type', 'Age Group', 'Gender'], observed=True).agg({
             'Billing Amount': 'mean'
         }).reset_index().sort_values(ascending=False, by='Billing Amount').head(10)
 
     def patient_count_by_admission_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Admission Type', 'Age Group', 'Gender']).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
+        return self.df.groupby(['Admission Type', 'Age Group', 'Gender'], observed=True).size().reset_index(name='Patient Count').sort_values(by='Patient Count', ascending=False).head(10)
 
     def avg_billing_by_medication_age_gender(self) -> pd.DataFrame:
-        return self.df.groupby(['Medication', 'Age Group', 'Gender']).agg({
+        return self.df.groupby(['Medication', 'Age Group', 'Gender'], observed=True).agg({
             'Billing Amount': 'mean'
         }).reset_index().sort_values(ascending=False, by='Billing Amount').head(10)
 
     def avg_length_of_stay_by_admission_age_gender(self) -> pd.DataFrame:
-        result = self.df.groupby(['Admission Type', 'Age Group', 'Gender']).agg({
+        result = self.df.groupby(['Admission Type', 'Age Group', 'Gender'], observed=True).agg({
             'Length of Stay': 'mean'
         }).reset_index().sort_values(ascending=False, by='Length of Stay').head(10)
         result['Length of Stay'] = result['Length of Stay'].round(0)
         return result
     
+class IncrementalDataAggregation(DataAggregation):
+    def __init__(self, exact: bool = False, relative_accuracy: float = 0.01):
+        # exact=True keeps every row and answers with DataAggregation, for verifying the store
+        self.exact = exact
+        self.relative_accuracy = relative_accuracy
+        self.df = None
+        self.store = AggregationStore(relative_accuracy)
+
+    def multivariate_analysis(self, df: pd.DataFrame):
+        self.df = None
+        self.store = AggregationStore(self.relative_accuracy)
+        self.append(df)
+
+    def append(self, df: pd.DataFrame):
+        if self.exact:
+            self.df = df if self.df is None else pd.concat([self.df, df], ignore_index=True)
+        else:
+            self.store.append(df)
+
+    def _answer(self, name) -> pd.DataFrame:
+        if self.exact:
+            return getattr(super(), name)()
+        return self.store.report(name)
+
+    def report(self, names=None) -> dict:
+        if self.exact:
+            return super().report(names)
+        return {name: self.store.report(name) for name in (names or REPORTS)}
+
+    def top_billing_by_age_medical_gender(self) -> pd.DataFrame:
+        return self._answer('top_billing_by_age_medical_gender')
+
+    def median_billing_by_admission_insurance(self) -> pd.DataFrame:
+        return self._answer('median_billing_by_admission_insurance')
+
+    def patient_count_by_blood_age_gender(self) -> pd.DataFrame:
+        return self._answer('patient_count_by_blood_age_gender')
+
+    def mean_billing_room_by_age_admission(self) -> pd.DataFrame:
+        return self._answer('mean_billing_room_by_age_admission')
+
+    def average_length_of_stay_by_age_gender(self) -> pd.DataFrame:
+        return self._answer('average_length_of_stay_by_age_gender')
+
+    def top_medications_by_medical_condition(self) -> pd.DataFrame:
+        return self._answer('top_medications_by_medical_condition')
+
+    def patient_count_by_medical_age_gender(self) -> pd.DataFrame:
+        return self._answer('patient_count_by_medical_age_gender')
+
+    def avg_billing_by_admission_medical_gender(self) -> pd.DataFrame:
+        return self._answer('avg_billing_by_admission_medical_gender')
+
+    def median_length_of_stay_by_age_insurance(self) -> pd.DataFrame:
+        return self._answer('median_length_of_stay_by_age_insurance')
+
+    def avg_billing_by_blood_age_gender(self) -> pd.DataFrame:
+        return self._answer('avg_billing_by_blood_age_gender')
+
+    def patient_count_by_admission_age_gender(self) -> pd.DataFrame:
+        return self._answer('patient_count_by_admission_age_gender')
+
+    def avg_billing_by_medication_age_gender(self) -> pd.DataFrame:
+        return self._answer('avg_billing_by_medication_age_gender')
+
+    def avg_length_of_stay_by_admission_age_gender(self) -> pd.DataFrame:
+        return self._answer('avg_length_of_stay_by_admission_age_gender')
+
 class CorrelationHeatmap(MultivariateAnalysis):
+    def __init__(self, method: str = 'pearson', block_size: int = 64, workers: int = None,
+                 dtype=np.float64, cache_dir: str = None):
+        # See Analysis.correlation; df may also be a callable returning an iterator of chunks
+        self.method = method
+        self.block_size = block_size
+        self.workers = workers
+        self.dtype = dtype
+        self.cache_dir = cache_dir
+
     def multivariate_analysis(self, df: pd.DataFrame):
-        df = df.select_dtypes(include=['number'])
+        corr = correlation_matrix(df, self.method, self.block_size, self.workers, self.dtype,
+                                  cache_dir=self.cache_dir)
         plt.figure(figsize=(10, 7))
-        sns.heatmap(data=df.corr(), cmap='crest', annot=True)
+        sns.heatmap(data=corr, cmap='crest', annot=True)
         plt.title("Correlation Heatmap")
         plt.show()
 
@@ -88,4 +173,45 @@ class MultivariateAnalysisFactory:
         return self.strategy.multivariate_analysis(df)
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    # Check: the planned engine and the chunked store against the plain groupby reports
+    rng = np.random.default_rng(0)
+    n_rows = 200_000
+    choice = lambda values: rng.choice(values, n_rows)
+    df = pd.DataFrame({
+        'Age Group': pd.Categorical(choice(['Children/Teenagers', 'Middle-aged Adults', 'Seniors', 'Young Adults'])),
+        'Gender': choice(['Female', 'Male']),
+        'Medical Condition': choice(['Arthritis', 'Asthma', 'Cancer', 'Diabetes', 'Hypertension', 'Obesity']),
+        'Blood Type': choice(['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']),
+        'Admission Type': choice(['Elective', 'Emergency', 'Urgent', None]),
+        'Insurance Provider': choice(['Aetna', 'Blue Cross', 'Cigna', 'Medicare', 'UnitedHealthcare']),
+        'Medication': choice(['Aspirin', 'Ibuprofen', 'Lipitor', 'Paracetamol', 'Penicillin']),
+        'Billing Amount': rng.uniform(-500, 50000, n_rows),
+        'Room Number': rng.integers(100, 500, n_rows).astype(np.float64),
+        'Length of Stay': np.where(rng.random(n_rows) < 0.01, np.nan, rng.integers(1, 31, n_rows)),
+    })
+    aggregation = DataAggregation()
+    aggregation.multivariate_analysis(df)
+    reference = {name: getattr(aggregation, name)() for name in REPORTS}
+    for name, result in aggregation.report().items():
+        pd.testing.assert_frame_equal(result.reset_index(drop=True), reference[name].reset_index(drop=True),
+                                      check_dtype=False, check_categorical=False)
+
+    store = IncrementalDataAggregation()
+    for start in range(0, n_rows, 50_000):
+        store.append(df.iloc[start:start + 50_000])
+    for name, result in store.report().items():
+        keys, aggs = REPORTS[name][:2]
+        if set(aggs.values()) <= DECOMPOSABLE:
+            pd.testing.assert_frame_equal(result.reset_index(drop=True).astype({k: object for k in keys}),
+                                          reference[name].reset_index(drop=True).astype({k: object for k in keys}),
+                                          check_dtype=False)
+        else:
+            # Sketched medians: every reported group within relative_accuracy of its exact median
+            exact = df.groupby(keys, observed=True).agg(aggs).reset_index()
+            merged = result.astype({k: object for k in keys}).merge(exact.astype({k: object for k in keys}),
+                                                                    on=keys, suffixes=('', ' exact'))
+            assert len(merged) == len(result)
+            for col in aggs:
+                error = (merged[col] - merged[f'{col} exact']).abs() / merged[f'{col} exact'].abs()
+                assert (error <= store.relative_accuracy).all(), (name, error.max())
+    print("aggregation reports match on", len(REPORTS), "reports")
@@ -0,0 +1,60 @@
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.pyplot as plt
+import pandas as pd
+
+# The frame is sent once per worker process instead of once per figure
+_worker_data = {}
+
+def _init_worker(df):
+    # Non-interactive backend: plt.show() becomes a no-op and figures stay open for saving.
+    # Figures inherited from a forked parent would otherwise be saved with the first job
+    plt.switch_backend('Agg')
+    plt.close('all')
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+    _worker_data['df'] = df
+
+def _save_figures(path, dpi=None):
+    # Every open figure is saved, the first to path and the rest to path_1, path_2, ..., then closed
+    stem, ext = os.path.splitext(path)
+    paths = []
+    for i, num in enumerate(plt.get_fignums()):
+        figure_path = path if i == 0 else f"{stem}_{i}{ext}"
+        plt.figure(num).savefig(figure_path, dpi=dpi, bbox_inches='tight')
+        paths.append(figure_path)
+    plt.close('all')
+    return paths
+
+def _render(name, func, args, path, dpi):
+    # Only the figures drawn by func belong to this job
+    plt.close('all')
+    start = time.perf_counter()
+    func(_worker_data['df'], *args)
+    paths = _save_figures(path, dpi)
+    return {'name': name, 'paths': paths, 'seconds': time.perf_counter() - start}
+
+class FigureRenderer:
+    def __init__(self, output_dir: str = 'figures', fmt: str = 'png', dpi: int = 100, workers: int = None):
+        self.output_dir = output_dir
+        self.fmt = fmt
+        self.dpi = dpi
+        self.workers = workers or os.cpu_count()
+
+    def render(self, df: pd.DataFrame, jobs: dict) -> pd.DataFrame:
+        # jobs maps a figure name to (callable, extra args), e.g.
+        # {'numerical': (UnivariateAnalysisFactory(NumericalUnivariateAnalysis()).analyze, ())}
+        os.makedirs(self.output_dir, exist_ok=True)
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(df,)) as pool:
+            futures = [pool.submit(_render, name, func, tuple(args),
+                                   os.path.join(self.output_dir, f"{name}.{self.fmt}"), self.dpi)
+                       for name, (func, args) in jobs.items()]
+            results = [future.result() for future in futures]
+        report = pd.DataFrame(results)
+        print(f"Rendered {len(report)} figures in {time.perf_counter() - start:.2f}s")
+        return report
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+import seaborn as sns
+
+# Colors seaborn 0.13 uses for single-color categorical plots
+FILL_COLOR = sns.desaturate('C0', .75)
+LINE_COLOR = (0.248, 0.248, 0.248)
+
+def sample_values(values: np.ndarray, sample: int = None, seed: int = 0, alpha: float = 0.05):
+    # Deterministic row sample plus a DKW bound on the CDF error of anything computed from it
+    if sample is None or sample >= len(values):
+        return values, {'rows': len(values), 'sample_size': len(values), 'cdf_error': 0.0, 'confidence': 1.0}
+    rows = np.sort(np.random.default_rng(seed).choice(len(values), size=sample, replace=False))
+    error = float(np.sqrt(np.log(2 / alpha) / (2 * sample)))
+    return values[rows], {'rows': len(values), 'sample_size': sample, 'cdf_error': error, 'confidence': 1 - alpha}
+
+def category_counts(series: pd.Series, sample: int = None, seed: int = 0):
+    # Categories in the order seaborn draws them, with one count per category
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes, labels = series.cat.codes.to_numpy(), list(series.cat.categories)
+    else:
+        codes, uniques = pd.factorize(series)
+        labels = list(uniques)
+    codes, bounds = sample_values(codes[codes >= 0], sample, seed)
+    counts = np.bincount(codes, minlength=len(labels)) * (bounds['rows'] / max(bounds['sample_size'], 1))
+    return labels, counts, bounds
+
+def distinct_counts(values: np.ndarray, max_bins: int = 4096):
+    # Exact distinct values for small integer ranges, otherwise a fine histogram of bin centers
+    if values.size == 0:
+        # An all-missing column has nothing to count
+        return values[:0], np.zeros(0, dtype=np.int64)
+    low, high = values.min(), values.max()
+    if np.issubdtype(values.dtype, np.integer) and high - low < max_bins:
+        counts = np.bincount(values - low)
+        return np.arange(low, high + 1)[counts > 0], counts[counts > 0]
+    counts, edges = np.histogram(values, bins=max_bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+    return centers[counts > 0], counts[counts > 0]
+
+def weighted_std(values, counts):
+    n = counts.sum()
+    mean = np.sum(values * counts) / n
+    return np.sqrt(np.sum(counts * (values - mean) ** 2) / (n - 1)) if n > 1 else 0.0
+
+def kde_grid(values, counts, std, cut: float = 3, gridsize: int = 200):
+    # Gaussian KDE with Scott's bandwidth, evaluated from distinct values and their counts
+    n = counts.sum()
+    bw = std * n ** (-1 / 5) if n else 0
+    if bw == 0:
+        return None, None
+    grid = np.linspace(values.min() - cut * bw, values.max() + cut * bw, gridsize)
+    z = (grid[:, None] - values[None, :]) / bw
+    density = (np.exp(-0.5 * z ** 2) @ counts) / (n * bw * np.sqrt(2 * np.pi))
+    return grid, density
+
+def weighted_percentile(values, counts, q):
+    # Linear-interpolated percentile of sorted values repeated counts times, as np.percentile would give
+    cumulative = np.cumsum(counts)
+    rank = (cumulative[-1] - 1) * np.asarray(q) / 100
+    lower = np.floor(rank)
+    at = lambda r: values[np.searchsorted(cumulative, r, side='right')]
+    return at(lower) + (rank - lower) * (at(np.minimum(lower + 1, cumulative[-1] - 1)) - at(lower))
+
+def box_stats(values, counts):
+    q1, median, q3 = weighted_percentile(values, counts, [25, 50, 75])
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    return {'q1': q1, 'med': median, 'q3': q3, 'iqr': iqr,
+            'whislo': values[inside].min(), 'whishi': values[inside].max(),
+            'fliers': values[~inside]}
+
+def numeric_summary(series: pd.Series, sample: int = None, seed: int = 0):
+    values, bounds = sample_values(series.dropna().to_numpy(), sample, seed)
+    scale = bounds['rows'] / max(bounds['sample_size'], 1)
+    edges = np.histogram_bin_edges(values, bins='auto')
+    hist, _ = np.histogram(values, bins=edges)
+    distinct, counts = distinct_counts(values)
+    std = np.std(values, ddof=1) if len(values) > 1 else 0.0
+    grid, density = kde_grid(distinct, counts, std, cut=0)
+    # The histogram KDE line is scaled from density to counts per bin
+    kde = None if grid is None else (grid, density * len(values) * scale * np.diff(edges).mean())
+    # Quartiles and whiskers come from the values themselves, only the fliers are deduplicated;
+    # an all-missing column gets no box, like seaborn draws none
+    box = None
+    if values.size:
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+        box = {'q1': q1, 'med': median, 'q3': q3, 'iqr': iqr,
+               'whislo': values[inside].min(), 'whishi': values[inside].max(),
+               'fliers': np.unique(values[~inside])}
+    return {'edges': edges, 'counts': hist * scale, 'kde': kde, 'box': box, 'bounds': bounds}
+
+def draw_histogram(ax, summary, column):
+    edges = summary['edges']
+    # Bin edges passed as a list: seaborn compares an array-valued bins against 'auto'
+    # and histplot(kde=True) draws its bars at half opacity
+    sns.histplot(x=edges[:-1], weights=summary['counts'], bins=list(edges), ax=ax,
+                 alpha=.5 if summary['kde'] is not None else .75)
+    if summary['kde'] is not None:
+        ax.plot(*summary['kde'], color='C0')
+    ax.set_xlabel(column)
+
+def draw_box(ax, summary, column):
+    if summary['box'] is not None:
+        ax.bxp([summary['box']], orientation='horizontal', positions=[0], widths=0.8, patch_artist=True,
+               manage_ticks=False, capwidths=0.4,
+               boxprops={'facecolor': FILL_COLOR, 'edgecolor': LINE_COLOR},
+               medianprops={'color': LINE_COLOR}, whiskerprops={'color': LINE_COLOR},
+               capprops={'color': LINE_COLOR}, flierprops={'markeredgecolor': LINE_COLOR, 'markersize': 5})
+    ax.set_ylim(0.5, -0.5)
+    ax.set_yticks([])
+    ax.set_xlabel(column)
+
+def draw_violin(ax, labels, counts, column):
+    positions = np.arange(len(labels), dtype=float)
+    present = counts > 0
+    values, weights = positions[present], counts[present]
+    grid, density = kde_grid(values, weights, weighted_std(values, weights), cut=2, gridsize=100)
+    if grid is not None:
+        half_width = density / density.max() * 0.4
+        ax.fill_between(grid, -half_width, half_width, facecolor=FILL_COLOR, edgecolor=LINE_COLOR, linewidth=1.25)
+    box = box_stats(values, weights)
+    ax.plot([box['whislo'], box['whishi']], [0, 0], color=LINE_COLOR, linewidth=1.875, solid_capstyle='butt')
+    ax.plot([box['q1'], box['q3']], [0, 0], color=LINE_COLOR, linewidth=5.625, solid_capstyle='butt')
+    ax.plot([box['med']], [0], marker='|', color=LINE_COLOR, markersize=5.625 / 1.2,
+            markeredgewidth=5.625 / 5, markeredgecolor='w', markerfacecolor='w')
+    ax.set_xticks(positions)
+    ax.set_xticklabels(labels)
+    ax.set_ylim(0.5, -0.5)
+    ax.set_yticks([])
+    ax.set_xlabel(column)
+
+def draw_counts(ax, labels, counts, column):
+    ax.bar(np.arange(len(labels)), counts, width=0.8, color=FILL_COLOR)
+    ax.set_xticks(np.arange(len(labels)))
+    ax.set_xticklabels(labels)
+    ax.set_xlim(-0.5, len(labels) - 0.5)
+    ax.set_xlabel(column)
+    ax.set_ylabel('count')
+
+if __name__ == "__main__":
+    pass
@@ -2,6 +2,7 @@ from abc import ABC, abstractmethod
 import matplotlib.pyplot as plt
 import pandas as pd
 import seaborn as sns
+from Analysis.summaries import numeric_summary, category_counts, draw_histogram, draw_box, draw_violin
 
 
 class UnivariateAnalysis(ABC):
@@ -50,6 +51,66 @@ class CategoricalUnivariateAnalysis(UnivariateAnalysis):
         plt.tight_layout()
         plt.show()
 
+class SummaryNumericalUnivariateAnalysis(UnivariateAnalysis):
+    # Same figure as NumericalUnivariateAnalysis, drawn from histogram/KDE/quartile summaries instead of rows
+    def __init__(self, sample: int = None, seed: int = 0):
+        self.sample = sample
+        self.seed = seed
+        self.bounds_ = {}
+
+    def univariate_analysis(self, df: pd.DataFrame):
+        df = df.select_dtypes(include=['number'])
+        numerical_columns = df.columns
+        num_columns = len(numerical_columns)
+        numerical_rows = (num_columns * 2 + num_columns - 1) // num_columns
+        fig, axes = plt.subplots(nrows=numerical_rows, ncols=num_columns, figsize=(20, 5 * numerical_rows))
+        axes = axes.flatten()
+        for i, column in enumerate(numerical_columns):
+            summary = numeric_summary(df[column], self.sample, self.seed)
+            self.bounds_[column] = summary['bounds']
+            # Plot histogram
+            draw_histogram(axes[i*2], summary, column)
+            axes[i*2].set_title(f"Distribution of {column}")
+            # Plot boxplot
+            draw_box(axes[i*2 + 1], summary, column)
+            axes[i*2 + 1].set_title(f"Boxplot of {column}")
+        for j in range(i*2 + 2, len(axes)):
+            fig.delaxes(axes[j])
+        if self.sample is not None:
+            print("Sampled summaries (CDF error bound per column):",
+                  {column: round(b['cdf_error'], 4) for column, b in self.bounds_.items()})
+        plt.tight_layout()
+        plt.show()
+
+
+class SummaryCategoricalUnivariateAnalysis(UnivariateAnalysis):
+    # Same figure as CategoricalUnivariateAnalysis, drawn from per-category counts instead of rows
+    def __init__(self, sample: int = None, seed: int = 0):
+        self.sample = sample
+        self.seed = seed
+        self.bounds_ = {}
+
+    def univariate_analysis(self, df: pd.DataFrame):
+        df = df.select_dtypes(exclude=['number'])
+        categorical_columns = df.columns
+        num_columns = len(categorical_columns)
+        max_columns_per_row = 2
+        categorical_rows = (num_columns + max_columns_per_row - 1) // max_columns_per_row
+        fig, axes = plt.subplots(nrows=categorical_rows, ncols=max_columns_per_row, figsize=(20, 5 * categorical_rows))
+        axes = axes.flatten()
+        for i, column in enumerate(categorical_columns):
+            labels, counts, self.bounds_[column] = category_counts(df[column], self.sample, self.seed)
+            draw_violin(axes[i], labels, counts, column)
+            axes[i].set_title(f"Violinplot of {column}")
+            axes[i].set_xticklabels(axes[i].get_xticklabels(), rotation=45)
+        for j in range(i + 1, len(axes)):
+            fig.delaxes(axes[j])
+        if self.sample is not None:
+            print("Sampled summaries (CDF error bound per column):",
+                  {column: round(b['cdf_error'], 4) for column, b in self.bounds_.items()})
+        plt.tight_layout()
+        plt.show()
+
 class UnivariateAnalysisFactory:
     def __init__(self, strategy : UnivariateAnalysis):
         self.strategy = strategy
@@ -0,0 +1,174 @@
+import json
+import os
+import time
+import numpy as np
+
+ARRAYS = ['left', 'right', 'feature', 'threshold', 'missing_left', 'value', 'roots']
+
+def resident_bytes():
+    # Current resident set size, only available on Linux
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _node_depth(children_left, children_right):
+    depth = np.full(len(children_left), -1)
+    frontier, level = np.array([0]), 0
+    while frontier.size:
+        depth[frontier] = level
+        children = np.concatenate([children_left[frontier], children_right[frontier]])
+        frontier, level = children[children >= 0], level + 1
+    return depth
+
+class FlatForest:
+    def __init__(self, left, right, feature, threshold, missing_left, value, roots, classes, max_depth,
+                 batch_size=10000):
+        # All trees are concatenated into one node table, child indices are global.
+        # missing_left marks the nodes that send NaN features to the left child
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.classes_ = np.asarray(classes)
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_sklearn(cls, rfc, max_trees: int = None, max_depth: int = None, dtype=np.float64):
+        # max_trees/max_depth cut the forest down, dtype=np.float32 halves thresholds and leaf values
+        left, right, feature, threshold, missing_left, value, roots = [], [], [], [], [], [], []
+        offset, depth_reached = 0, 0
+        for estimator in rfc.estimators_[:max_trees]:
+            tree = estimator.tree_
+            children_left, children_right = tree.children_left, tree.children_right
+            keep = np.ones(tree.node_count, dtype=bool)
+            leaf = children_left == -1
+            if max_depth is not None and tree.max_depth > max_depth:
+                depth = _node_depth(children_left, children_right)
+                keep = depth <= max_depth
+                # Nodes on the depth limit become leaves holding their own class distribution
+                leaf = leaf | (depth == max_depth)
+            new_id = np.cumsum(keep) - 1
+            roots.append(offset)
+            left.append(np.where(leaf, -1, new_id[children_left] + offset)[keep])
+            right.append(np.where(leaf, -1, new_id[children_right] + offset)[keep])
+            feature.append(np.where(leaf, 0, tree.feature)[keep])
+            threshold.append(tree.threshold[keep])
+            # Trees fitted without missing value support (sklearn < 1.3) send NaN right: NaN <= t is False
+            missing_left.append(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=bool))[keep])
+            # Store per-node class probabilities, as each tree's predict_proba does
+            proba = tree.value[keep, 0, :]
+            value.append(proba / proba.sum(axis=1, keepdims=True))
+            offset += int(keep.sum())
+            depth_reached = max(depth_reached, tree.max_depth if max_depth is None else min(tree.max_depth, max_depth))
+        threshold = np.concatenate(threshold)
+        narrow = threshold.astype(dtype)
+        # Round narrowed thresholds down, never up: a float32 feature x satisfies x <= t exactly when it
+        # satisfies x <= the largest float32 not above t, so every row keeps sklearn's branch
+        above = narrow.astype(np.float64) > threshold
+        narrow[above] = np.nextafter(narrow[above], narrow.dtype.type(-np.inf))
+        return cls(np.concatenate(left).astype(np.int32), np.concatenate(right).astype(np.int32),
+                   np.concatenate(feature).astype(np.int32), narrow, np.concatenate(missing_left).astype(bool),
+                   np.concatenate(value).astype(dtype), np.asarray(roots, dtype=np.int32), rfc.classes_, depth_reached)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def apply(self, X):
+        # Walk every row down every tree at once, one tree level per iteration
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        rows = np.arange(len(X))[:, None]
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            internal = left >= 0
+            if not internal.any():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = (x <= self.threshold[node]) | (np.isnan(x) & self.missing_left[node])
+            node = np.where(internal, np.where(go_left, left, self.right[node]), node)
+        return node
+
+    def predict_proba(self, X):
+        # Trees compare float32 features, like sklearn does
+        X = np.asarray(X, dtype=np.float32)
+        proba = np.empty((len(X), len(self.classes_)), dtype=self.value.dtype)
+        for start in range(0, len(X), self.batch_size):
+            leaves = self.apply(X[start:start + self.batch_size])
+            proba[start:start + self.batch_size] = self.value[leaves].mean(axis=1)
+        return proba
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+def _meta(forest):
+    return {'classes': forest.classes_.tolist(), 'max_depth': int(forest.max_depth)}
+
+def save_forest(forest: FlatForest, path, compress=False):
+    if compress:
+        # Cold storage: one compressed file, loaded fully into memory. numpy appends .npz itself, so the
+        # suffix is added here to return the real filename
+        path = path if str(path).endswith('.npz') else f"{path}.npz"
+        np.savez_compressed(path, meta=json.dumps(_meta(forest)), **{name: getattr(forest, name) for name in ARRAYS})
+    else:
+        # Hot storage: uncompressed .npy files that every worker can memory-map and share
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(forest, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(_meta(forest), f)
+    print(f"Forest artifact saved to {path}")
+    return path
+
+def load_forest(path, mmap=True):
+    # Accepts a compressed artifact with or without its .npz suffix
+    if not os.path.exists(path) and os.path.exists(f"{path}.npz"):
+        path = f"{path}.npz"
+    rss_before = resident_bytes()
+    start = time.perf_counter()
+    if os.path.isdir(path):
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r' if mmap else None) for name in ARRAYS}
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+    else:
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in ARRAYS}
+            meta = json.loads(str(data['meta']))
+    forest = FlatForest(classes=meta['classes'], max_depth=meta['max_depth'], **arrays)
+    load_seconds = time.perf_counter() - start
+    # Mapped pages only become resident when read, so measure after one warm-up prediction
+    forest.predict(np.zeros((1, int(forest.feature.max()) + 1), dtype=np.float32))
+    rss_after = resident_bytes()
+    report = {
+        'load_seconds': load_seconds,
+        'artifact_bytes': forest.nbytes,
+        'mapped': os.path.isdir(path) and mmap,
+        'resident_bytes': rss_after,
+        'resident_delta_bytes': None if rss_before is None else rss_after - rss_before,
+    }
+    return forest, report
+
+if __name__ == "__main__":
+    import tempfile
+    from sklearn.ensemble import RandomForestClassifier
+
+    # Check: the flat forest, narrowed and saved, scores like sklearn's predict_proba, rows with NaN included
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(5000, 6))
+    y = np.where(X[:, 0] + X[:, 1] > 0, 'Abnormal', np.where(X[:, 2] > 0.5, 'Inconclusive', 'Normal'))
+    X[rng.random(X.shape) < 0.05] = np.nan
+    rfc = RandomForestClassifier(n_estimators=20, random_state=0).fit(X[:4000], y[:4000])
+    X_test = X[4000:].astype(np.float32)
+    expected = rfc.predict_proba(X_test)
+    for dtype in [np.float64, np.float32]:
+        forest = FlatForest.from_sklearn(rfc, dtype=dtype)
+        assert np.allclose(forest.predict_proba(X_test), expected, atol=1e-6)
+        with tempfile.TemporaryDirectory() as directory:
+            loaded, _ = load_forest(save_forest(forest, os.path.join(directory, 'forest')))
+            assert (loaded.predict(X_test) == rfc.predict(X_test)).all()
+    print("flat forest matches sklearn on", len(X_test), "rows")
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from Model.prediction import ModelPredictorFactory
+
+class MicroBatchScorer:
+    def __init__(self, factory: ModelPredictorFactory, max_batch_size: int = 256, max_wait_ms: float = 5.0, workers: int = 1):
+        self.factory = factory
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.workers = workers
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+        self.errors = 0
+        self.failed_requests = 0
+        self._latencies = deque(maxlen=10000)
+        self._queue = None
+        self._collector = None
+        self._executor = None
+        self._slots = None
+        self._inflight = set()
+        self._running = False
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        self._collector = asyncio.create_task(self._collect())
+        self._running = True
+
+    async def stop(self):
+        # Requests already queued are still scored, new ones are refused
+        self._running = False
+        await self._queue.put(None)
+        await self._collector
+        if self._inflight:
+            await asyncio.gather(*self._inflight)
+        self._executor.shutdown()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def predict(self, df: pd.DataFrame):
+        if not self._running:
+            raise RuntimeError("MicroBatchScorer is not running; call start() or use it as an async context manager")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((df, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            rows = len(item[0])
+            # Keep pulling requests until the batch is full or the oldest request has waited long enough
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while rows < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await self._slots.acquire()
+            task = loop.create_task(self._run_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            frames = [df for df, _, _ in batch]
+            try:
+                # Mismatched columns would be NaN-filled by concat, so such batches are scored per request
+                if any(not df.columns.equals(frames[0].columns) for df in frames[1:]):
+                    raise ValueError("Requests in the batch have different columns")
+                X = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+                y_pred = await loop.run_in_executor(self._executor, self.factory.run, X)
+                # Fan the vectorized result back out to each caller
+                offsets = np.cumsum([len(df) for df in frames])[:-1]
+                results = [(part, None) for part in np.split(np.asarray(y_pred), offsets)]
+            except Exception as e:
+                self.errors += 1
+                if len(frames) == 1:
+                    results = [(None, e)]
+                else:
+                    # Score the requests one at a time so only the bad ones see the error
+                    results = []
+                    for df in frames:
+                        try:
+                            results.append((np.asarray(await loop.run_in_executor(self._executor, self.factory.run, df)), None))
+                        except Exception as error:
+                            results.append((None, error))
+            now = time.perf_counter()
+            for (part, error), (df, future, submitted) in zip(results, batch):
+                if error is not None:
+                    self.failed_requests += 1
+                    if not future.done():
+                        future.set_exception(error)
+                    continue
+                if not future.done():
+                    future.set_result(part)
+                self._latencies.append(now - submitted)
+                self.requests += 1
+                self.rows += len(df)
+            self.batches += 1
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        latencies = np.array(self._latencies) * 1000
+        return {
+            'requests': self.requests,
+            'rows': self.rows,
+            'batches': self.batches,
+            # errors counts failed batches, failed_requests the callers that got an exception
+            'errors': self.errors,
+            'failed_requests': self.failed_requests,
+            'mean_batch_rows': self.rows / self.batches if self.batches else 0.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'latency_max_ms': float(latencies.max()) if len(latencies) else 0.0,
+        }
+
+if __name__ == "__main__":
+    pass
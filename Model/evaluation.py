@@ -1,7 +1,8 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
 import pandas as pd
-from sklearn.metrics import confusion_matrix, accuracy_score
-from sklearn.metrics import precision_score, recall_score, f1_score
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -10,17 +11,185 @@ class Evaluate(ABC):
     def evaluate(self, df: pd.DataFrame, y_pred):
         pass
 
+def metric_arrays(cm: np.ndarray) -> dict:
+    # Metrics for any stack of confusion matrices (..., k, k) at once
+    support, predicted = cm.sum(axis=-1), cm.sum(axis=-2)
+    correct = np.diagonal(cm, axis1=-2, axis2=-1)
+    total = support.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Undefined per-class ratios count as 0, like sklearn's zero_division default
+        precision = np.nan_to_num(correct / predicted)
+        recall = np.nan_to_num(correct / support)
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+        # Empty matrices (e.g. a slice missing from a resample) give NaN rather than 0
+        weights = support / total[..., None]
+        accuracy = correct.sum(axis=-1) / total
+    return {'accuracy': accuracy, 'precision': (weights * precision).sum(axis=-1),
+            'recall': (weights * recall).sum(axis=-1), 'f1': (weights * f1).sum(axis=-1),
+            'class_precision': precision, 'class_recall': recall, 'class_f1': f1}
+
+class ConfusionCounts:
+    def __init__(self):
+        # Confusion matrix over the sorted labels seen so far; every metric is derived from it
+        self.labels = np.empty(0)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+
+    def _align(self, labels):
+        # Grow the matrix to the union of labels, keeping them sorted like sklearn's unique_labels
+        labels = np.union1d(self.labels, labels) if len(self.labels) else np.sort(labels)
+        if len(labels) != len(self.labels):
+            counts = np.zeros((len(labels), len(labels)), dtype=np.int64)
+            if len(self.labels):
+                position = np.searchsorted(labels, self.labels)
+                counts[np.ix_(position, position)] = self.counts
+            self.labels, self.counts = labels, counts
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        size = 0
+        if np.issubdtype(y_true.dtype, np.integer) and np.issubdtype(y_pred.dtype, np.integer) \
+                and len(y_true) and min(y_true.min(), y_pred.min()) >= 0:
+            size = int(max(y_true.max(), y_pred.max())) + 1
+        # Small non-negative integer codes (e.g. LabelEncode output) need no lookup: count pairs over 0..max
+        # directly. Sparse large labels would make that table huge, so they take the lookup path below.
+        if size and size * size <= max(4 * len(y_true), 1 << 16):
+            # int64 so narrow dtypes cannot overflow the pair codes
+            y_true, y_pred = y_true.astype(np.int64), y_pred.astype(np.int64)
+            counts = np.bincount(y_true * size + y_pred, minlength=size * size).reshape(size, size)
+            present = counts.sum(axis=0) + counts.sum(axis=1) > 0
+            labels, counts = np.arange(size)[present], counts[np.ix_(present, present)]
+        else:
+            labels = np.union1d(pd.unique(y_true), pd.unique(y_pred))
+            index = pd.Index(labels)
+            codes = index.get_indexer(y_true) * len(labels) + index.get_indexer(y_pred)
+            counts = np.bincount(codes, minlength=len(labels) ** 2).reshape(len(labels), len(labels))
+        return self.merge_counts(labels, counts)
+
+    def merge_counts(self, labels, counts):
+        self._align(labels)
+        position = np.searchsorted(self.labels, labels)
+        self.counts[np.ix_(position, position)] += counts
+        return self
+
+    def merge(self, other: 'ConfusionCounts'):
+        # Partial matrices from other chunks or worker processes
+        return self.merge_counts(other.labels, other.counts) if len(other.labels) else self
+
+    def metrics(self) -> dict:
+        cm = self.counts
+        scores = metric_arrays(cm)
+        per_class = pd.DataFrame({'precision': scores['class_precision'], 'recall': scores['class_recall'],
+                                  'f1': scores['class_f1'], 'support': cm.sum(axis=1)}, index=self.labels)
+        return {'confusion_matrix': cm.copy(), 'labels': self.labels, 'accuracy': scores['accuracy'],
+                'precision': float(scores['precision']), 'recall': float(scores['recall']),
+                'f1': float(scores['f1']), 'per_class': per_class, 'n': int(cm.sum())}
+
+class MetricsEvaluator(Evaluate):
+    # Headless evaluation: one confusion matrix pass, structured results, no printing or plotting
+    def evaluate(self, df: pd.DataFrame, y_pred) -> dict:
+        return ConfusionCounts().update(df, y_pred).metrics()
+
+    def evaluate_chunks(self, pairs) -> dict:
+        # pairs is any iterable of (y_true, y_pred) chunks
+        counts = ConfusionCounts()
+        for y_true, y_pred in pairs:
+            counts.update(y_true, y_pred)
+        return counts.metrics()
+
+# Row codes are sent once per worker process instead of once per batch of resamples
+_worker_data = {}
+
+def _init_worker(codes, cells):
+    _worker_data['codes'] = codes
+    _worker_data['cells'] = cells
+
+def _bootstrap_counts(seed, n_resamples):
+    # Resamples are index arrays; one bincount over (resample, slice, true, pred) codes counts them all
+    codes, cells = _worker_data['codes'], _worker_data['cells']
+    rows = np.random.default_rng(seed).integers(0, len(codes), size=(n_resamples, len(codes)))
+    combined = codes[rows] + (np.arange(n_resamples) * cells)[:, None, None]
+    return np.bincount(combined.ravel(), minlength=n_resamples * cells).reshape(n_resamples, cells)
+
+class SlicedEvaluator(Evaluate):
+    metrics = ['accuracy', 'precision', 'recall', 'f1']
+
+    def __init__(self, n_boot: int = 1000, alpha: float = 0.05, seed: int = 0, n_jobs: int = 1,
+                 memory_rows: int = 20_000_000):
+        # Percentile bootstrap intervals; batches of resamples get fixed child seeds,
+        # so results do not depend on n_jobs. memory_rows bounds the index arrays drawn at once.
+        self.n_boot = n_boot
+        self.alpha = alpha
+        self.seed = seed
+        # None and -1 mean all cores, as in RFCSearch
+        self.n_jobs = joblib.effective_n_jobs(n_jobs or -1)
+        self.memory_rows = memory_rows
+
+    def _codes(self, y_true, y_pred, slices: pd.DataFrame):
+        y_true, y_pred = np.asarray(y_true), np.asarray(y_pred)
+        labels = pd.Index(np.union1d(pd.unique(y_true), pd.unique(y_pred)))
+        k = len(labels)
+        pair = labels.get_indexer(y_true) * k + labels.get_indexer(y_pred)
+        # Every slice column partitions the rows; slice values get consecutive ids across columns,
+        # rows with a missing slice value go to one spare id that is dropped at the end
+        keys, columns, offset = [], [], 0
+        for name in slices.columns:
+            codes, uniques = pd.factorize(slices[name], sort=True)
+            columns.append(np.where(codes >= 0, codes + offset, -1))
+            keys += [(name, value) for value in uniques]
+            offset += len(uniques)
+        slice_ids = np.stack(columns, axis=1)
+        slice_ids[slice_ids < 0] = offset
+        codes = slice_ids * (k * k) + pair[:, None]
+        return codes.astype(np.int64), keys, k, (offset + 1) * k * k
+
+    def _batches(self, n_rows, width):
+        size = max(1, min(self.n_boot, self.memory_rows // max(n_rows * width, 1)))
+        sizes = [min(size, self.n_boot - start) for start in range(0, self.n_boot, size)]
+        return zip(np.random.SeedSequence(self.seed).spawn(len(sizes)), sizes)
+
+    def evaluate(self, df, y_pred, slices=None) -> pd.DataFrame:
+        # slices: DataFrame of slice columns aligned with the predictions, e.g.
+        # raw_test[['Medical Condition', 'Age Group', 'Insurance Provider']]; None evaluates overall only
+        slices = pd.DataFrame(index=range(len(y_pred))) if slices is None else slices.reset_index(drop=True)
+        slices = slices.assign(**{'(all)': 'all'})
+        codes, keys, k, cells = self._codes(df, y_pred, slices)
+        shape = (-1, k, k)
+        point = metric_arrays(np.bincount(codes.ravel(), minlength=cells).reshape(shape)[:len(keys)])
+        batches = list(self._batches(*codes.shape))
+        if self.n_jobs == 1:
+            _init_worker(codes, cells)
+            counts = [_bootstrap_counts(seed, size) for seed, size in batches]
+        else:
+            with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker, initargs=(codes, cells)) as pool:
+                counts = list(pool.map(_bootstrap_counts, *zip(*batches)))
+        boot = metric_arrays(np.concatenate(counts).reshape(self.n_boot, *shape)[:, :len(keys)])
+
+        report = pd.DataFrame(index=pd.MultiIndex.from_tuples(keys, names=['slice', 'value']))
+        report['n'] = np.bincount(codes.ravel() // (k * k), minlength=cells // (k * k))[:len(keys)]
+        for metric in self.metrics:
+            low, high = np.nanpercentile(boot[metric], [100 * self.alpha / 2, 100 * (1 - self.alpha / 2)], axis=0)
+            report[metric] = point[metric]
+            report[f'{metric}_low'] = low
+            report[f'{metric}_high'] = high
+        return report
+
 class ConfusionMatrixEvaluator(Evaluate):
+    def __init__(self, show: bool = True, save_path: str = None):
+        # show=False skips plt.show(), save_path writes the figure instead of (or as well as) showing it
+        self.show = show
+        self.save_path = save_path
+
     def evaluate(self, df: pd.DataFrame, y_pred):
-        cm = confusion_matrix(df, y_pred)
-        accuracy = accuracy_score(df, y_pred)
+        metrics = ConfusionCounts().update(df, y_pred).metrics()
+        cm, accuracy = metrics['confusion_matrix'], metrics['accuracy']
         
         print("Confusion Matrix:")
         print(cm)
         print(f"Accuracy: {accuracy:.2f}")
         
         # Plot confusion matrix
-        self.plot_confusion_matrix(cm)
+        if self.show or self.save_path is not None:
+            self.plot_confusion_matrix(cm)
         
         return cm, accuracy
     
@@ -30,15 +199,19 @@ class ConfusionMatrixEvaluator(Evaluate):
         plt.title('Confusion Matrix')
         plt.xlabel('Predicted Labels')
         plt.ylabel('Actual Labels')
-        plt.show()
+        if self.save_path is not None:
+            plt.savefig(self.save_path, bbox_inches='tight')
+        if self.show:
+            plt.show()
+        else:
+            plt.close()
 
 class AccuracyEvaluator(Evaluate):
     def evaluate(self, df: pd.DataFrame, y_pred):
         
-        # Compute precision, recall, and F1-score
-        precision = precision_score(df, y_pred, average='weighted')  
-        recall = recall_score(df, y_pred, average='weighted')
-        f1 = f1_score(df, y_pred, average='weighted')
+        # Compute precision, recall, and F1-score from a single confusion matrix
+        metrics = ConfusionCounts().update(df, y_pred).metrics()
+        precision, recall, f1 = metrics['precision'], metrics['recall'], metrics['f1']
         
         print(f"Precision: {precision:.2f}")
         print(f"Recall: {recall:.2f}")
@@ -50,8 +223,9 @@ class EvaluateFactory:
     def __init__(self, evaluation: Evaluate):
         self.evaluation = evaluation
 
-    def evaluate(self, df: pd.DataFrame, y_pred):
-        return self.evaluation.evaluate(df, y_pred)
+    def evaluate(self, df: pd.DataFrame, y_pred, *args, **kwargs):
+        # Extra arguments go to the strategy, e.g. slices for SlicedEvaluator
+        return self.evaluation.evaluate(df, y_pred, *args, **kwargs)
 
 if __name__ == "__main__":
     pass
@@ -1,7 +1,18 @@
+import os
+import pickle
+import time
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold
 import joblib
+from Model.artifact import FlatForest, save_forest, resident_bytes
+from Model.evaluation import EvaluateFactory, AccuracyEvaluator, MetricsEvaluator
 
 class Model(ABC):
     @abstractmethod
@@ -9,21 +20,311 @@ class Model(ABC):
         pass
 
 class RFC(Model):
+    def __init__(self, n_jobs: int = -1, artifact_path: str = None, compress_artifact: bool = False, **params):
+        self.n_jobs = n_jobs
+        # Optional flat forest artifact for memory-mapped scoring, see Model.artifact
+        self.artifact_path = artifact_path
+        self.compress_artifact = compress_artifact
+        self.params = params
+
     def build_model(self, X_train, y_train, model_filename='model.pkl'):
-        rfc = RandomForestClassifier()
+        rfc = RandomForestClassifier(n_jobs=self.n_jobs, **self.params)
         rfc.fit(X_train, y_train)
         # Save the model to a file
         joblib.dump(rfc, model_filename)
         print(f"Model saved to {model_filename}")
+        if self.artifact_path is not None:
+            save_forest(FlatForest.from_sklearn(rfc), self.artifact_path, compress=self.compress_artifact)
         return rfc
-        
+
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100, 200, 400],
+    'max_depth': [None, 10, 20, 30],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', 'log2'],
+}
+
+# Training data is sent once per worker process instead of once per trial
+_worker_data = {}
+
+def _init_worker(X, y):
+    _worker_data['X'] = X
+    _worker_data['y'] = y
+
+def _run_trial(trial, candidate, params, n_samples, cv, random_state, prune_below):
+    X, y = _worker_data['X'], _worker_data['y']
+    if n_samples < len(y):
+        rows = np.random.default_rng(random_state).permutation(len(y))[:n_samples]
+        X, y = X[rows], y[rows]
+    rss_before = resident_bytes()
+    scores, pruned, model_bytes, rss_peak = [], False, 0, rss_before
+    fit_seconds = serialize_seconds = 0.0
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    for train, test in folds.split(X, y):
+        start = time.perf_counter()
+        model = RandomForestClassifier(n_jobs=1, random_state=random_state, **params)
+        model.fit(X[train], y[train])
+        scores.append(model.score(X[test], y[test]))
+        fit_seconds += time.perf_counter() - start
+        # Resident size while the fitted fold model is alive; the worker's lifetime peak would mix in earlier trials
+        if rss_before is not None:
+            rss_peak = max(rss_peak, resident_bytes())
+        # Model size is measured outside the timed fit so it does not skew score_per_second
+        start = time.perf_counter()
+        model_bytes = max(model_bytes, len(pickle.dumps(model)))
+        serialize_seconds += time.perf_counter() - start
+        del model
+        # Stop a trial early once its running score cannot catch up with the best so far
+        if prune_below is not None and np.mean(scores) < prune_below:
+            pruned = True
+            break
+    score = float(np.mean(scores))
+    return {'trial': trial, 'candidate': candidate, **params, 'n_samples': n_samples, 'score': score,
+            'folds': len(scores), 'pruned': pruned, 'fit_seconds': fit_seconds, 'score_per_second': score / fit_seconds,
+            'serialize_seconds': serialize_seconds,
+            'rss_delta_bytes': None if rss_before is None else rss_peak - rss_before, 'model_bytes': model_bytes}
+
+class RFCSearch(Model):
+    def __init__(self, param_grid: dict = None, n_trials: int = 20, search: str = 'random',
+                 n_jobs: int = None, cv: int = 3, eta: int = 3, prune_tolerance: float = 0.02,
+                 random_state: int = 42, log_filename: str = 'search_log.csv'):
+        self.param_grid = param_grid or DEFAULT_PARAM_GRID
+        self.n_trials = n_trials
+        self.search = search
+        # Core budget shared by the search pool and the final refit; None and -1 mean all cores
+        self.n_jobs = joblib.effective_n_jobs(n_jobs or -1)
+        self.cv = cv
+        self.eta = eta
+        self.prune_tolerance = prune_tolerance
+        self.random_state = random_state
+        self.log_filename = log_filename
+
+    def _candidates(self):
+        rng = np.random.default_rng(self.random_state)
+        return [{name: values[rng.integers(len(values))] for name, values in self.param_grid.items()}
+                for _ in range(self.n_trials)]
+
+    def _evaluate(self, pool, candidates, n_samples, prune, first_trial=0):
+        # candidates are (candidate id, params) pairs; trial ids continue from first_trial so they stay
+        # unique across halving rounds. At most n_jobs trials are in flight so the pruning threshold
+        # tracks the best finished trial.
+        results, pending, best = [], set(), None
+        queue = [(first_trial + i, candidate, params) for i, (candidate, params) in enumerate(candidates)]
+        while queue or pending:
+            while queue and len(pending) < self.n_jobs:
+                trial, candidate, params = queue.pop(0)
+                prune_below = best - self.prune_tolerance if prune and best is not None else None
+                pending.add(pool.submit(_run_trial, trial, candidate, params, n_samples, self.cv, self.random_state,
+                                        prune_below))
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                results.append(result)
+                if not result['pruned']:
+                    best = result['score'] if best is None else max(best, result['score'])
+        return sorted(results, key=lambda r: r['trial'])
+
+    def build_model(self, X_train, y_train, model_filename='model.pkl'):
+        X, y = np.asarray(X_train), np.asarray(y_train)
+        candidates = list(enumerate(self._candidates()))
+        log = []
+        with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_init_worker, initargs=(X, y)) as pool:
+            if self.search == 'halving':
+                # Successive halving: score every candidate on a small sample, keep the top 1/eta, grow the sample
+                # One round more than the number of times eta divides into the candidate count, counted in
+                # integers: a float log can land just below an exact power (log(243, 3) < 5)
+                rounds, size = 1, self.eta
+                while size <= len(candidates):
+                    rounds, size = rounds + 1, size * self.eta
+                n_samples = max(len(y) // self.eta ** (rounds - 1), self.cv * 10)
+                for rnd in range(rounds):
+                    results = self._evaluate(pool, candidates, min(n_samples, len(y)), prune=False, first_trial=len(log))
+                    log += [{'round': rnd, **r} for r in results]
+                    ranked = sorted(range(len(candidates)), key=lambda i: results[i]['score'], reverse=True)
+                    candidates = [candidates[i] for i in ranked[:max(len(candidates) // self.eta, 1)]]
+                    n_samples *= self.eta
+                best_params = candidates[0][1]
+            else:
+                results = self._evaluate(pool, candidates, len(y), prune=True)
+                log += [{'round': 0, **r} for r in results]
+                best_params = max(results, key=lambda r: r['score'])
+                best_params = {name: best_params[name] for name in self.param_grid}
+
+        self.results_ = pd.DataFrame(log)
+        self.results_.to_csv(self.log_filename, index=False)
+        print(f"Search log saved to {self.log_filename}")
+        self.best_params_ = best_params
+        print("Best parameters:", best_params)
+        return RFC(n_jobs=self.n_jobs, random_state=self.random_state, **best_params).build_model(
+            X_train, y_train, model_filename)
+
+def lighten(rfc, max_trees: int = None, max_depth: int = None, dtype=np.float32) -> FlatForest:
+    # Lighter inference model for latency-sensitive scoring: fewer/shallower trees, float32 arrays
+    return FlatForest.from_sklearn(rfc, max_trees=max_trees, max_depth=max_depth, dtype=dtype)
+
+def light_model_report(rfc, light: FlatForest, X_test, y_test, repeats: int = 100) -> pd.DataFrame:
+    rows = []
+    y_true = np.asarray(y_test)
+    single_rows = [X_test.iloc[[i]] if isinstance(X_test, pd.DataFrame) else X_test[i:i + 1]
+                   for i in range(min(repeats, len(y_true)))]
+    for name, model, size in (('original', rfc, len(pickle.dumps(rfc))), ('light', light, light.nbytes)):
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        batch_seconds = time.perf_counter() - start
+        precision, recall, f1 = EvaluateFactory(AccuracyEvaluator()).evaluate(y_test, y_pred)
+        latencies = []
+        for row in single_rows:
+            start = time.perf_counter()
+            model.predict(row)
+            latencies.append((time.perf_counter() - start) * 1000)
+        rows.append({'model': name, 'accuracy': float(np.mean(y_pred == y_true)), 'precision': precision,
+                     'recall': recall, 'f1': f1, 'batch_seconds': batch_seconds,
+                     'row_p50_ms': float(np.percentile(latencies, 50)),
+                     'row_p99_ms': float(np.percentile(latencies, 99)), 'bytes': size})
+    return pd.DataFrame(rows).set_index('model')
+
+class ModelRegistry:
+    def __init__(self, root: str = 'model_registry'):
+        # One directory per version (v0001, v0002, ...) holding the pickled model and its meta.json
+        self.root = root
+
+    def _path(self, version: int) -> str:
+        return os.path.join(self.root, f"v{version:04d}")
+
+    def latest(self):
+        if not os.path.isdir(self.root):
+            return None
+        versions = [int(name[1:]) for name in os.listdir(self.root)
+                    if name.startswith('v') and name[1:].isdigit()
+                    and os.path.exists(os.path.join(self.root, name, 'meta.json'))]
+        return max(versions, default=None)
+
+    def register(self, model, **meta) -> int:
+        version = (self.latest() or 0) + 1
+        path = self._path(version)
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        joblib.dump(model, os.path.join(tmp, 'model.pkl'))
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'version': version, 'created': time.time(), **meta}, f, default=float)
+        # The version only becomes visible once complete
+        os.replace(tmp, path)
+        print(f"Model registered as version {version} in {self.root}")
+        return version
+
+    def load(self, version: int = None):
+        version = self.latest() if version is None else version
+        if version is None:
+            raise FileNotFoundError(f"No model versions in {self.root}")
+        path = self._path(version)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        return joblib.load(os.path.join(path, 'model.pkl')), meta
+
+    def versions(self) -> pd.DataFrame:
+        rows = []
+        for version in range(1, (self.latest() or 0) + 1):
+            if os.path.exists(os.path.join(self._path(version), 'meta.json')):
+                rows.append(self.load(version)[1])
+        return pd.DataFrame(rows).set_index('version') if rows else pd.DataFrame()
+
+class RFCWarmStart(Model):
+    def __init__(self, registry: ModelRegistry, n_new_trees: int = 50, max_trees: int = None, n_jobs: int = -1,
+                 artifact_path: str = None, compress_artifact: bool = False, **params):
+        # Each build adds n_new_trees fitted on the new rows to the latest registered forest; the first
+        # build (empty registry) is a full fit with params. max_trees drops the oldest trees beyond that count.
+        self.registry = registry
+        self.n_new_trees = n_new_trees
+        self.max_trees = max_trees
+        self.n_jobs = n_jobs
+        self.artifact_path = artifact_path
+        self.compress_artifact = compress_artifact
+        self.params = params
+
+    def warm_fit(self, X_train, y_train):
+        parent = self.registry.latest()
+        if parent is None:
+            rfc = RandomForestClassifier(n_jobs=self.n_jobs, **self.params)
+            rfc.fit(X_train, y_train)
+            return rfc, 'full', None
+        rfc, _ = self.registry.load(parent)
+        # New trees only see the new rows, so the label set and feature layout must not change
+        if not np.array_equal(np.unique(np.asarray(y_train)), rfc.classes_):
+            raise ValueError(f"New data has classes {np.unique(np.asarray(y_train))}, the registered model "
+                             f"{rfc.classes_}; retrain from scratch instead")
+        if np.shape(X_train)[1] != rfc.n_features_in_:
+            raise ValueError(f"New data has {np.shape(X_train)[1]} features, the registered model "
+                             f"{rfc.n_features_in_}; retrain from scratch instead")
+        random_state = rfc.random_state
+        if isinstance(random_state, (int, np.integer)):
+            # sklearn seeds new trees by skipping len(estimators_) draws, so after trimming to max_trees a fixed
+            # random_state would hand out seeds already used; each version draws from its own seed instead
+            random_state = int(np.random.SeedSequence([int(random_state), parent]).generate_state(1)[0])
+        rfc.set_params(warm_start=True, n_jobs=self.n_jobs, n_estimators=len(rfc.estimators_) + self.n_new_trees,
+                       random_state=random_state)
+        rfc.fit(X_train, y_train)
+        rfc.set_params(warm_start=False)
+        if self.max_trees is not None and len(rfc.estimators_) > self.max_trees:
+            rfc.estimators_ = rfc.estimators_[-self.max_trees:]
+            rfc.n_estimators = self.max_trees
+        return rfc, 'warm', parent
+
+    def build_model(self, X_train, y_train, model_filename='model.pkl'):
+        start = time.perf_counter()
+        rfc, mode, parent = self.warm_fit(X_train, y_train)
+        seconds = time.perf_counter() - start
+        joblib.dump(rfc, model_filename)
+        print(f"Model saved to {model_filename}")
+        if self.artifact_path is not None:
+            save_forest(FlatForest.from_sklearn(rfc), self.artifact_path, compress=self.compress_artifact)
+        self.version_ = self.registry.register(rfc, mode=mode, parent=parent, rows=len(y_train),
+                                               n_estimators=len(rfc.estimators_), fit_seconds=seconds)
+        return rfc
+
+def retrain_report(registry: ModelRegistry, X_history, y_history, X_new, y_new, X_test, y_test,
+                   n_new_trees: int = 50, n_jobs: int = -1, register: bool = False) -> pd.DataFrame:
+    # Warm start on the new rows versus a full retrain on history + new rows, both scored on the same test set.
+    # The full retrain reuses the registered model's parameters and matches the warm forest's size.
+    if registry.latest() is None:
+        raise FileNotFoundError(f"No model versions in {registry.root}; build a base model first")
+    base, _ = registry.load()
+    warm_start = RFCWarmStart(registry, n_new_trees=n_new_trees, n_jobs=n_jobs)
+    start = time.perf_counter()
+    warm, _, parent = warm_start.warm_fit(X_new, y_new)
+    warm_seconds = time.perf_counter() - start
+
+    full = clone(base).set_params(warm_start=False, n_jobs=n_jobs, n_estimators=len(warm.estimators_))
+    X_all = pd.concat([X_history, X_new]) if isinstance(X_history, pd.DataFrame) else np.concatenate([X_history, X_new])
+    y_all = pd.concat([y_history, y_new]) if isinstance(y_history, pd.Series) else np.concatenate([y_history, y_new])
+    start = time.perf_counter()
+    full.fit(X_all, y_all)
+    full_seconds = time.perf_counter() - start
+
+    rows = {}
+    for name, model, seconds, rows_fitted in (('warm', warm, warm_seconds, len(y_new)),
+                                              ('full', full, full_seconds, len(y_all))):
+        metrics = MetricsEvaluator().evaluate(y_test, model.predict(X_test))
+        rows[name] = {'fit_seconds': seconds, 'rows_fitted': rows_fitted, 'n_estimators': len(model.estimators_),
+                      'accuracy': float(metrics['accuracy']), 'precision': metrics['precision'],
+                      'recall': metrics['recall'], 'f1': metrics['f1']}
+        if register:
+            rows[name]['version'] = registry.register(model, mode=name, parent=parent if name == 'warm' else None,
+                                                      rows=rows_fitted, n_estimators=len(model.estimators_),
+                                                      fit_seconds=seconds, test_accuracy=rows[name]['accuracy'])
+    report = pd.DataFrame(rows).T
+    # Positive accuracy/f1 deltas mean the warm model scores better; speedup is full time over warm time
+    report.loc['delta'] = report.loc['warm'] - report.loc['full']
+    report.loc['delta', ['rows_fitted', 'n_estimators'] + (['version'] if register else [])] = np.nan
+    report['speedup'] = [full_seconds / warm_seconds, np.nan, np.nan]
+    return report
+
 class ModelFactory:
     def __init__(self, strategy : Model):
         self.strategy = strategy
 
     def execute(self, X_train, y_train):
         return self.strategy.build_model(X_train, y_train)
-    
+
 if __name__ == "__main__":
     pass
-
@@ -1,6 +1,10 @@
+import os
+import threading
+from collections import OrderedDict
 import pandas as pd
 import joblib
 from abc import ABC, abstractmethod
+from Model.artifact import load_forest
 
 class Pred(ABC):
     @abstractmethod
@@ -17,8 +21,87 @@ class ModelPredictor(Pred):
         print("Predictions made.")
         return y_pred
 
+class ModelCache:
+    def __init__(self, max_models: int = 2):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, model_filename):
+        # A model version is identified by its path plus the file's mtime and size
+        path = os.path.abspath(model_filename)
+        stat = os.stat(path)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, model_filename):
+        key = self._key(model_filename)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+        model = joblib.load(key[0])
+
+        with self._lock:
+            # Drop stale versions of the same file, then evict least recently used models
+            for stale in [k for k in self._models if k[0] == key[0] and k != key]:
+                del self._models[stale]
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+        return model
+
+    def reload(self, model_filename):
+        self.evict(model_filename)
+        return self.get(model_filename)
+
+    def evict(self, model_filename):
+        path = os.path.abspath(model_filename)
+        with self._lock:
+            for key in [k for k in self._models if k[0] == path]:
+                del self._models[key]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def __len__(self):
+        return len(self._models)
+
+# Process-wide cache shared by every CachedModelPredictor
+model_cache = ModelCache()
+
+class CachedModelPredictor(ModelPredictor):
+    def __init__(self, model_filename=r'D:\Machine Learning Project\Health Care\model.pkl', cache: ModelCache = None):
+        super().__init__(model_filename)
+        self.cache = cache if cache is not None else model_cache
+
+    def pred(self, df: pd.DataFrame):
+        model = self.cache.get(self.model_filename)
+        y_pred = model.predict(df)
+        print("Predictions made.")
+        return y_pred
+
+    def reload(self):
+        return self.cache.reload(self.model_filename)
+
+class MappedModelPredictor(Pred):
+    def __init__(self, artifact_path='forest', mmap: bool = True):
+        self.artifact_path = artifact_path
+        self.mmap = mmap
+        self.forest = None
+        self.load_report = None
+
+    def pred(self, df: pd.DataFrame):
+        if self.forest is None:
+            self.forest, self.load_report = load_forest(self.artifact_path, mmap=self.mmap)
+            print(f"Forest loaded in {self.load_report['load_seconds']:.3f}s")
+        y_pred = self.forest.predict(df)
+        print("Predictions made.")
+        return y_pred
+
 class ModelPredictorFactory:
-    def __init__(self, predictor: ModelPredictor):
+    def __init__(self, predictor: Pred):
         self.predictor = predictor
 
     def run(self, df: pd.DataFrame):
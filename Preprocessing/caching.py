@@ -0,0 +1,193 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pandas.arrays import ArrowExtensionArray
+
+def _hash_strings(digest, chunks):
+    # Arrow strings are hashed from their buffers, slices of a larger array only hash their own range.
+    # Lengths, bytes and nulls go to separate digests so chunk boundaries do not change the result.
+    lengths, data, nulls = (hashlib.blake2b(digest_size=16) for _ in range(3))
+    for chunk in chunks:
+        _, offsets, buffer = chunk.buffers()
+        width = np.int64 if chunk.type == pa.large_string() else np.int32
+        offsets = np.frombuffer(offsets, dtype=width)[chunk.offset:chunk.offset + len(chunk) + 1]
+        lengths.update(np.diff(offsets).astype(np.int64).data)
+        if buffer is not None:
+            data.update(memoryview(buffer)[offsets[0]:offsets[-1]])
+        nulls.update(chunk.is_null().to_numpy(zero_copy_only=False).view(np.uint8).data)
+    for part in (lengths, data, nulls):
+        digest.update(part.digest())
+
+def _hash_series(digest, series: pd.Series):
+    digest.update(f"{series.name}|{series.dtype}".encode())
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        digest.update(np.ascontiguousarray(series.cat.codes.to_numpy()).data)
+        series = pd.Series(series.cat.categories)
+    if getattr(series.dtype, 'storage', None) == 'pyarrow' or isinstance(series.array, ArrowExtensionArray):
+        chunks = pa.chunked_array(pa.array(series.array))
+        if chunks.type in (pa.string(), pa.large_string()):
+            _hash_strings(digest, chunks.chunks)
+            return
+    values = series.to_numpy()
+    if values.dtype.kind in 'biufcmM':
+        # Fixed-width buffers are hashed as raw bytes, no per-value work
+        digest.update(np.ascontiguousarray(values).view(np.uint8).data)
+    else:
+        digest.update(pd.util.hash_pandas_object(series, index=False).to_numpy().data)
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(df.index, pd.RangeIndex):
+        digest.update(f"{df.index.start}|{df.index.stop}|{df.index.step}".encode())
+    else:
+        _hash_series(digest, df.index.to_series())
+    for name in df.columns:
+        _hash_series(digest, df[name])
+    return digest.hexdigest()
+
+def strategy_fingerprint(strategy, method: str) -> str:
+    # Class, its source, and the parameters set in __init__; fitted attributes (trailing _) are left out
+    cls = type(strategy)
+    try:
+        source = inspect.getsource(cls)
+    except (OSError, TypeError):
+        source = ''
+    params = {name: repr(value) for name, value in sorted(vars(strategy).items()) if not name.endswith('_')}
+    text = f"{cls.__module__}.{cls.__qualname__}.{method}|{source}|{json.dumps(params)}"
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+class StageCache:
+    def __init__(self, cache_dir: str = '.stage_cache', max_bytes: int = 2 * 1024 ** 3, max_age_days: float = 7):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.log = []
+
+    def key(self, strategy, method: str, df: pd.DataFrame, args=()) -> str:
+        stage = strategy_fingerprint(strategy, f"{method}{args!r}")
+        return f"{stage[:16]}{frame_fingerprint(df)[:16]}"
+
+    @staticmethod
+    def _write(outputs, path):
+        kinds = []
+        for i, output in enumerate(outputs):
+            if isinstance(output, pd.Series):
+                kinds.append(['series', output.name])
+                output = output.to_frame('__series__')
+            elif isinstance(output, pd.DataFrame):
+                kinds.append(['frame', None])
+            else:
+                kinds.append(['object', None])
+                joblib.dump(output, os.path.join(path, f'{i}.pkl'))
+                continue
+            output.to_parquet(os.path.join(path, f'{i}.parquet'))
+        return kinds
+
+    @staticmethod
+    def _read(kinds, path):
+        outputs = []
+        for i, (kind, name) in enumerate(kinds):
+            if kind == 'object':
+                outputs.append(joblib.load(os.path.join(path, f'{i}.pkl')))
+                continue
+            output = pd.read_parquet(os.path.join(path, f'{i}.parquet'))
+            outputs.append(output['__series__'].rename(name) if kind == 'series' else output)
+        return outputs
+
+    def _store(self, key, strategy, result, inplace, seconds):
+        path = os.path.join(self.cache_dir, key)
+        tmp = path + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        outputs = list(result) if isinstance(result, tuple) else [result]
+        # Fitted state travels with the outputs so a later transform() works after a hit
+        joblib.dump({name: value for name, value in vars(strategy).items() if name.endswith('_')},
+                    os.path.join(tmp, 'state.pkl'))
+        meta = {'kinds': self._write(outputs, tmp), 'tuple': isinstance(result, tuple),
+                'inplace': inplace, 'seconds': seconds, 'created': time.time()}
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+
+    def _load(self, key, strategy, df):
+        path = os.path.join(self.cache_dir, key)
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        outputs = self._read(meta['kinds'], path)
+        for name, value in joblib.load(os.path.join(path, 'state.pkl')).items():
+            setattr(strategy, name, value)
+        if meta['inplace']:
+            # The stage mutates its input (e.g. Preparation), so replay that on the caller's frame
+            cached = outputs[0]
+            df.drop(columns=[name for name in df.columns if name not in cached.columns], inplace=True)
+            for name in cached.columns:
+                df[name] = cached[name]
+            outputs[0] = df
+        # Touch the entry so eviction sees it as recently used
+        os.utime(os.path.join(path, 'meta.json'))
+        return (tuple(outputs) if meta['tuple'] else outputs[0]), meta['seconds']
+
+    def run(self, strategy, method: str, df: pd.DataFrame, *args):
+        start = time.perf_counter()
+        key = self.key(strategy, method, df, args)
+        if os.path.exists(os.path.join(self.cache_dir, key, 'meta.json')):
+            result, saved = self._load(key, strategy, df)
+            self._record(strategy, method, 'hit', time.perf_counter() - start, saved)
+            return result
+        result = getattr(strategy, method)(df, *args)
+        seconds = time.perf_counter() - start
+        first = result[0] if isinstance(result, tuple) else result
+        self._store(key, strategy, result, first is df, seconds)
+        self.evict()
+        self._record(strategy, method, 'miss', seconds, 0.0)
+        return result
+
+    def _record(self, strategy, method, status, seconds, saved):
+        entry = {'stage': f"{type(strategy).__name__}.{method}", 'status': status,
+                 'seconds': seconds, 'saved_seconds': max(saved - seconds, 0.0) if status == 'hit' else 0.0}
+        self.log.append(entry)
+        print(f"Stage cache {status}: {entry['stage']} ({seconds:.3f}s, saved {entry['saved_seconds']:.3f}s)")
+
+    def report(self) -> pd.DataFrame:
+        return pd.DataFrame(self.log, columns=['stage', 'status', 'seconds', 'saved_seconds'])
+
+    def evict(self):
+        # Drop entries past max_age_days, then least recently used ones until under max_bytes
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, key)
+            meta = os.path.join(path, 'meta.json')
+            if not os.path.exists(meta):
+                continue
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            entries.append((os.path.getmtime(meta), size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - self.max_age_days * 86400
+        for used, size, path in entries:
+            if used >= cutoff and total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+def run_stage(cache: StageCache, strategy, method: str, df: pd.DataFrame, *args):
+    # Factories call their strategy through here; without a cache it is a plain call
+    if cache is None:
+        return getattr(strategy, method)(df, *args)
+    return cache.run(strategy, method, df, *args)
+
+if __name__ == "__main__":
+    pass
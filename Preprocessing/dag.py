@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import time
+import warnings
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait
+import pandas as pd
+import pyarrow as pa
+
+class ArrowFrame:
+    # A frame handed to another process as a memory-mapped Arrow IPC file instead of a pickle
+    def __init__(self, path):
+        self.path = path
+
+    def load(self) -> pd.DataFrame:
+        with pa.memory_map(self.path) as source:
+            return pa.ipc.open_file(source).read_all().to_pandas()
+
+def _share(df: pd.DataFrame, directory, name) -> ArrowFrame:
+    path = os.path.join(directory, f"{name}.arrow")
+    table = pa.Table.from_pandas(df)
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return ArrowFrame(path)
+
+def _init_process():
+    import matplotlib.pyplot as plt
+    # Plot nodes run headless; their figures are saved by _run_process when figure_dir is set
+    plt.switch_backend('Agg')
+    plt.close('all')
+    warnings.filterwarnings('ignore', message='.*non-interactive.*')
+
+def _run_thread(func, args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+def _run_process(name, func, args, directory, figure_dir):
+    import matplotlib.pyplot as plt
+    from Analysis.rendering import _save_figures
+    args = [arg.load() if isinstance(arg, ArrowFrame) else arg for arg in args]
+    # Only the figures drawn by this node are saved under its name
+    plt.close('all')
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    if figure_dir is not None:
+        _save_figures(os.path.join(figure_dir, f"{name}.png"))
+    plt.close('all')
+    if isinstance(result, pd.DataFrame):
+        try:
+            result = _share(result, directory, name)
+        except (pa.ArrowException, TypeError, ValueError):
+            pass
+    return result, seconds
+
+class PipelineGraph:
+    def __init__(self, workers: int = None, process_workers: int = None, figure_dir: str = None):
+        # Thread nodes suit pandas/numpy work that releases the GIL; a frame read by several nodes is
+        # copied for each thread node so in-place stages (e.g. Preparation) cannot race their siblings.
+        # Process nodes suit pure-Python or plotting work (pyplot is not thread-safe)
+        self.workers = workers or os.cpu_count()
+        self.process_workers = process_workers or os.cpu_count()
+        self.figure_dir = figure_dir
+        self.nodes = {}
+
+    def add(self, name, func, deps=(), executor: str = 'thread', args=()):
+        # func is called with the results of deps in order, followed by args
+        if executor not in ('thread', 'process'):
+            raise ValueError("executor must be 'thread' or 'process'")
+        self.nodes[name] = {'func': func, 'deps': list(deps), 'executor': executor, 'args': tuple(args)}
+        return self
+
+    def _order(self, inputs):
+        missing = {dep for node in self.nodes.values() for dep in node['deps']} - set(self.nodes) - set(inputs)
+        if missing:
+            raise ValueError(f"Unknown dependencies: {sorted(missing)}")
+        # Kahn's algorithm: rejects cycles up front and gives the order for the critical path
+        order = []
+        remaining = {name: set(node['deps']) - set(inputs) for name, node in self.nodes.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle between {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            order += ready
+        return order
+
+    def _critical_path(self, order, seconds):
+        # Longest chain of measured node times; no schedule can finish faster than this
+        finish, previous = {}, {}
+        for name in order:
+            deps = [dep for dep in self.nodes[name]['deps'] if dep in self.nodes]
+            best = max(deps, key=lambda dep: finish[dep], default=None)
+            finish[name] = seconds[name] + (finish[best] if best else 0.0)
+            previous[name] = best
+        node = max(finish, key=finish.get)
+        path = [node]
+        while previous[path[-1]] is not None:
+            path.append(previous[path[-1]])
+        return path[::-1], finish[node]
+
+    def run(self, **inputs) -> dict:
+        order = self._order(inputs)
+        results = dict(inputs)
+        shared = {}
+        directory = tempfile.mkdtemp(prefix='pipeline-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+        if self.figure_dir is not None:
+            os.makedirs(self.figure_dir, exist_ok=True)
+        rows, pending = [], {}
+        waiting = dict(self.nodes)
+        readers = Counter(dep for node in self.nodes.values() for dep in node['deps'])
+        start = time.perf_counter()
+
+        def thread_arg(dep):
+            value = results[dep]
+            return value.copy() if isinstance(value, pd.DataFrame) and readers[dep] > 1 else value
+
+        def process_arg(dep):
+            # Each frame is written once, however many process nodes read it
+            value = results[dep]
+            if not isinstance(value, pd.DataFrame):
+                return value
+            if dep not in shared:
+                shared[dep] = _share(value, directory, dep)
+            return shared[dep]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as threads, \
+                 ProcessPoolExecutor(max_workers=self.process_workers, initializer=_init_process) as processes:
+                while waiting or pending:
+                    for name in [name for name, node in waiting.items() if all(dep in results for dep in node['deps'])]:
+                        node = waiting.pop(name)
+                        submitted = time.perf_counter() - start
+                        if node['executor'] == 'process':
+                            args = [process_arg(dep) for dep in node['deps']] + list(node['args'])
+                            future = processes.submit(_run_process, name, node['func'], args, directory, self.figure_dir)
+                        else:
+                            args = [thread_arg(dep) for dep in node['deps']] + list(node['args'])
+                            future = threads.submit(_run_thread, node['func'], args)
+                        pending[future] = (name, submitted)
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name, submitted = pending.pop(future)
+                        result, seconds = future.result()
+                        if isinstance(result, ArrowFrame):
+                            # The worker already wrote the frame, downstream process nodes reuse that file
+                            shared[name] = result
+                            result = result.load()
+                        results[name] = result
+                        finished = time.perf_counter() - start
+                        rows.append({'node': name, 'executor': self.nodes[name]['executor'],
+                                     'deps': ', '.join(self.nodes[name]['deps']), 'submitted': submitted,
+                                     'finished': finished, 'seconds': seconds,
+                                     # Queueing, process start-up and frame transfer
+                                     'overhead': finished - submitted - seconds})
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        wall = time.perf_counter() - start
+        self.report_ = pd.DataFrame(rows).sort_values('submitted', kind='mergesort').reset_index(drop=True)
+        path, length = self._critical_path(order, dict(zip(self.report_['node'], self.report_['seconds'])))
+        self.report_['critical'] = self.report_['node'].isin(path)
+        self.summary_ = {'wall_seconds': wall, 'critical_path_seconds': length,
+                         'sequential_seconds': float(self.report_['seconds'].sum()), 'critical_path': path}
+        print(f"Pipeline finished in {wall:.2f}s (critical path {length:.2f}s, "
+              f"sequential {self.summary_['sequential_seconds']:.2f}s): {' -> '.join(path)}")
+        return {name: results[name] for name in self.nodes}
+
+if __name__ == "__main__":
+    pass
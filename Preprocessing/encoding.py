@@ -1,37 +1,82 @@
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
-from sklearn.preprocessing import OrdinalEncoder, LabelEncoder, OneHotEncoder
+from sklearn.preprocessing import OneHotEncoder
+from Preprocessing.caching import StageCache, run_stage
 
 class Encoding(ABC):
     @abstractmethod
     def encoding(self, df : pd.DataFrame):
         pass
 
+    @abstractmethod
+    def fit(self, df : pd.DataFrame):
+        pass
+
+    @abstractmethod
+    def transform(self, df : pd.DataFrame):
+        pass
+
+def _lookup(values: pd.Series, categories: pd.Index) -> np.ndarray:
+    # Vectorized category -> code lookup, unseen values become NaN
+    codes = categories.get_indexer(values).astype('float64')
+    codes[codes < 0] = np.nan
+    return codes
+
 class OrdinalEncode(Encoding):
-    def encoding(self, df: pd.DataFrame):
-        df_to_encode = df[['Gender','Admission Type', 'Medical Condition', 'Insurance Provider', 'Medication']]
-        oe = OrdinalEncoder()
-        df_encoded = pd.DataFrame(oe.fit_transform(df_to_encode), 
-                                  columns=df_to_encode.columns)
-        df_final = pd.concat([df.drop(columns=['Gender','Admission Type', 'Medical Condition', 'Insurance Provider', 'Medication']), df_encoded], axis=1)
+    columns = ['Gender','Admission Type', 'Medical Condition', 'Insurance Provider', 'Medication']
+
+    def fit(self, df: pd.DataFrame):
+        # Same sorted categories OrdinalEncoder would learn
+        self.categories_ = {col: pd.Index(np.sort(df[col].dropna().unique())) for col in self.columns}
+        return self
+
+    def transform(self, df: pd.DataFrame):
+        df_encoded = pd.DataFrame({col: _lookup(df[col], self.categories_[col]) for col in self.columns},
+                                  index=df.index)
+        df_final = pd.concat([df.drop(columns=self.columns), df_encoded], axis=1)
         return df_final
 
+    def encoding(self, df: pd.DataFrame):
+        return self.fit(df).transform(df)
+
 
 class LabelEncode(Encoding):
-    def encoding(self, df: pd.DataFrame):
+    def fit(self, df: pd.DataFrame):
+        self.classes_ = pd.Index(np.sort(df['Test Results'].unique()))
+        return self
+
+    def transform(self, df: pd.DataFrame):
+        # Scoring frames carry no target, so there is nothing to encode
+        if 'Test Results' not in df.columns:
+            return df
+        codes = self.classes_.get_indexer(df['Test Results'])
+        if (codes < 0).any():
+            # Like LabelEncoder, labels not seen in fit are an error rather than a silent -1
+            unseen = pd.unique(df['Test Results'][codes < 0])
+            raise ValueError(f"Test Results contains previously unseen labels: {list(unseen)}")
         df_encode = df.copy()
-        df_target = df_encode['Test Results']
-        le = LabelEncoder()
-        df_encode['Test Results'] = le.fit_transform(df_target)
+        df_encode['Test Results'] = codes
         return df_encode
 
+    def encoding(self, df: pd.DataFrame):
+        return self.fit(df).transform(df)
+
 
 class EncodingFactory:
-    def __init__(self, strategy : Encoding):
+    def __init__(self, strategy : Encoding, cache: StageCache = None):
         self.strategy = strategy
+        self.cache = cache
         
     def preprocess(self, df : pd.DataFrame):
-        return self.strategy.encoding(df)
+        return run_stage(self.cache, self.strategy, 'encoding', df)
+
+    def fit(self, df : pd.DataFrame):
+        self.strategy.fit(df)
+        return self
+
+    def transform(self, df : pd.DataFrame):
+        return self.strategy.transform(df)
     
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from abc import ABC, abstractmethod
+
+CATEGORICAL = ['Gender', 'Blood Type', 'Medical Condition', 'Insurance Provider',
+               'Admission Type', 'Medication', 'Test Results']
+DATES = ['Date of Admission', 'Discharge Date']
+
+class DataSchema:
+    def __init__(self, categorical=CATEGORICAL, dates=DATES, downcast: bool = True):
+        self.categorical = list(categorical)
+        self.dates = list(dates)
+        self.downcast = downcast
+
+    def key(self) -> str:
+        return json.dumps([self.categorical, self.dates, self.downcast])
+
+    def arrow_types(self) -> dict:
+        # Low-cardinality strings are dictionary-encoded while parsing; dates stay strings and are
+        # parsed by apply() with errors='coerce', the way Preparation parses them
+        types = {name: pa.dictionary(pa.int32(), pa.string()) for name in self.categorical}
+        types.update({name: pa.string() for name in self.dates})
+        return types
+
+    @staticmethod
+    def _narrow(series: pd.Series) -> pd.Series:
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return pd.to_numeric(series, downcast='integer')
+        if pd.api.types.is_float_dtype(series.dtype) and series.dtype != np.float32:
+            # float32 only when every value survives the round trip
+            narrow = series.astype(np.float32)
+            if np.array_equal(narrow.to_numpy(dtype=np.float64), series.to_numpy(), equal_nan=True):
+                return narrow
+        return series
+
+    def apply(self, df: pd.DataFrame) -> pd.DataFrame:
+        for name in df.columns:
+            if name in self.categorical and not isinstance(df[name].dtype, pd.CategoricalDtype):
+                df[name] = df[name].astype('category')
+            elif name in self.dates and not pd.api.types.is_datetime64_any_dtype(df[name].dtype):
+                df[name] = pd.to_datetime(df[name], errors='coerce')
+            elif self.downcast:
+                df[name] = self._narrow(df[name])
+        return df
+
+def _expression(filters):
+    # Filters use the read_parquet form, e.g. [('Age', '>=', 60), ('Gender', '==', 'Male')]
+    return None if not filters else pq.filters_to_expression(filters)
+
+def _filter_columns(filters) -> list:
+    # Flat filters are a list of (column, op, value) tuples; DNF filters are a list of such lists
+    terms = [term for group in filters for term in (group if isinstance(group, list) else [group])]
+    return [name for name, _, _ in terms]
+
+class DataLoader(ABC):
+    @abstractmethod
+    def load(self, path, columns=None, filters=None) -> pd.DataFrame:
+        pass
+
+class ParquetLoader(DataLoader):
+    def __init__(self, schema: DataSchema = None):
+        self.schema = schema or DataSchema()
+
+    def load(self, path, columns=None, filters=None) -> pd.DataFrame:
+        # Projection and predicates are pushed down: only matching columns and row groups are read
+        table = pq.read_table(path, columns=columns, filters=_expression(filters))
+        return self.schema.apply(table.to_pandas())
+
+class CSVLoader(DataLoader):
+    def __init__(self, schema: DataSchema = None, cache_dir: str = '.cache', use_cache: bool = True,
+                 row_group_size: int = 100_000):
+        # With use_cache the CSV is converted once to a typed Parquet copy and every load reads that copy
+        self.schema = schema or DataSchema()
+        self.cache_dir = cache_dir
+        self.use_cache = use_cache
+        self.row_group_size = row_group_size
+
+    def _read(self, path, columns=None, filters=None) -> pd.DataFrame:
+        wanted = columns
+        if columns is not None and filters:
+            # Filter columns are read too and dropped after filtering
+            wanted = list(dict.fromkeys([*columns, *_filter_columns(filters)]))
+        table = pa_csv.read_csv(path, convert_options=pa_csv.ConvertOptions(
+            column_types=self.schema.arrow_types(), include_columns=wanted))
+        df = self.schema.apply(table.to_pandas())
+        if filters:
+            rows = pa.Table.from_pandas(df, preserve_index=False).filter(_expression(filters))
+            df = rows.to_pandas()
+        return df if columns is None else df[columns]
+
+    def cache_path(self, path) -> str:
+        # The cache is keyed by the source file version and the schema, so edits invalidate it
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}|{self.schema.key()}"
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir, f"{stem}-{hashlib.sha1(key.encode()).hexdigest()[:12]}.parquet")
+
+    def convert(self, path) -> str:
+        cache = self.cache_path(path)
+        if not os.path.exists(cache):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            df = self._read(path)
+            df.to_parquet(cache + '.tmp', index=False, row_group_size=self.row_group_size)
+            os.replace(cache + '.tmp', cache)
+            print(f"Parquet copy saved to {cache}")
+        return cache
+
+    def load(self, path, columns=None, filters=None) -> pd.DataFrame:
+        if not self.use_cache:
+            return self._read(path, columns, filters)
+        return ParquetLoader(self.schema).load(self.convert(path), columns, filters)
+
+class DataLoaderFactory:
+    def __init__(self, strategy: DataLoader):
+        self.strategy = strategy
+
+    def load(self, path, columns=None, filters=None) -> pd.DataFrame:
+        return self.strategy.load(path, columns, filters)
+
+def memory_report(path, loader: DataLoader = None) -> pd.DataFrame:
+    # Per-column footprint of a default pd.read_csv load versus the schema-typed load
+    default = pd.read_csv(path)
+    typed = (loader or CSVLoader()).load(path)
+    report = pd.DataFrame({
+        'default_dtype': default.dtypes.astype(str),
+        'default_bytes': default.memory_usage(deep=True, index=False),
+        'typed_dtype': typed.dtypes.astype(str),
+        'typed_bytes': typed.memory_usage(deep=True, index=False),
+    })
+    report.loc['total'] = ['', report['default_bytes'].sum(), '', report['typed_bytes'].sum()]
+    report['ratio'] = report['default_bytes'] / report['typed_bytes']
+    return report
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,50 @@
+import os
+import joblib
+import pandas as pd
+from Preprocessing.encoding import EncodingFactory, OrdinalEncode, LabelEncode
+from Preprocessing.selection import SelectionFactory, FeatSelect
+from Preprocessing.scaling import ScalingFactory, FeatScale
+from Analysis.missing_value_analysis import MissingValueAnalysisFactory, FittedImputer
+
+def preprocessing_filename(model_filename='model.pkl'):
+    # The fitted preprocessing artifact lives next to the model it was trained with
+    return os.path.join(os.path.dirname(model_filename), 'preprocessing.pkl')
+
+class PreprocessingPipeline:
+    def __init__(self, stages=None, imputer: FittedImputer = None):
+        if stages is None:
+            stages = [EncodingFactory(OrdinalEncode()),
+                      EncodingFactory(LabelEncode()),
+                      SelectionFactory(FeatSelect()),
+                      ScalingFactory(FeatScale())]
+        # A fitted imputer runs first and is saved with the rest of the preprocessing artifact
+        if imputer is not None:
+            stages = [MissingValueAnalysisFactory(imputer)] + list(stages)
+        self.stages = stages
+
+    def fit(self, df: pd.DataFrame):
+        self.fit_transform(df)
+        return self
+
+    def fit_transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        for stage in self.stages:
+            df = stage.fit(df).transform(df)
+        return df
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        for stage in self.stages:
+            df = stage.transform(df)
+        return df
+
+    def save(self, model_filename='model.pkl'):
+        filename = preprocessing_filename(model_filename)
+        joblib.dump(self, filename)
+        print(f"Preprocessing saved to {filename}")
+        return filename
+
+    @staticmethod
+    def load(model_filename='model.pkl'):
+        return joblib.load(preprocessing_filename(model_filename))
+
+if __name__ == "__main__":
+    pass
@@ -1,28 +1,46 @@
 import pandas as pd
 from abc import ABC, abstractmethod
 from sklearn.preprocessing import StandardScaler
+from Preprocessing.caching import StageCache, run_stage
 
 class Scaling(ABC):
     @abstractmethod
     def feature_scale(self, df : pd.DataFrame):
         pass
 
-class FeatScale:
-    def feature_scale(self, df: pd.DataFrame) -> pd.DataFrame:
-        # Columns that need scaling
-        columns_to_scale = ['Age', 'Billing Amount', 'Room Number']
-        
-        # Select columns to scale
-        df_to_scale = df[columns_to_scale]
+    @abstractmethod
+    def fit(self, df : pd.DataFrame):
+        pass
+
+    @abstractmethod
+    def transform(self, df : pd.DataFrame):
+        pass
 
-        ss = StandardScaler()
-        scaled_values = ss.fit_transform(df_to_scale)
+class FeatScale(Scaling):
+    # Columns that need scaling
+    columns_to_scale = ['Age', 'Billing Amount', 'Room Number']
+
+    def fit(self, df: pd.DataFrame):
+        # Only the columns still present are scaled, e.g. after selection dropped some of them
+        self.columns_ = [col for col in self.columns_to_scale if col in df.columns]
+        if self.columns_:
+            ss = StandardScaler()
+            ss.fit(df[self.columns_])
+            self.mean_ = ss.mean_
+            self.scale_ = ss.scale_
+        return self
+
+    def transform(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Fitted scaling is a plain affine map, no refitting on the incoming frame
+        if not self.columns_:
+            return df
+        scaled_values = (df[self.columns_].to_numpy(dtype='float64') - self.mean_) / self.scale_
         
         # Create a DataFrame with scaled values
-        scaled_df = pd.DataFrame(scaled_values, columns=columns_to_scale, index=df.index)
+        scaled_df = pd.DataFrame(scaled_values, columns=self.columns_, index=df.index)
         
         # Combine the scaled DataFrame with the columns that do not need scaling
-        columns_not_to_scale = [col for col in df.columns if col not in columns_to_scale]
+        columns_not_to_scale = [col for col in df.columns if col not in self.columns_]
         df_not_to_scale = df[columns_not_to_scale]
         
         # Concatenate scaled and non-scaled DataFrames
@@ -30,12 +48,23 @@ class FeatScale:
         
         return df_combined
 
+    def feature_scale(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(df).transform(df)
+
 class ScalingFactory:
-    def __init__(self, strategy : Scaling):
+    def __init__(self, strategy : Scaling, cache: StageCache = None):
         self.strategy = strategy
+        self.cache = cache
 
     def feature(self, df : pd.DataFrame):
-        return self.strategy.feature_scale(df)
+        return run_stage(self.cache, self.strategy, 'feature_scale', df)
+
+    def fit(self, df : pd.DataFrame):
+        self.strategy.fit(df)
+        return self
+
+    def transform(self, df : pd.DataFrame):
+        return self.strategy.transform(df)
     
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -1,44 +1,246 @@
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
 import pandas as pd
+import joblib
 from abc import ABC, abstractmethod
-from sklearn.feature_selection  import SelectKBest, chi2
+from Preprocessing.caching import StageCache, run_stage, frame_fingerprint
 
 class Feature(ABC):
     @abstractmethod
     def feature_select(self, df : pd.DataFrame):
         pass
 
+    @abstractmethod
+    def fit(self, df : pd.DataFrame):
+        pass
+
+    @abstractmethod
+    def transform(self, df : pd.DataFrame):
+        pass
+
+# Scores already computed in this process, keyed by data fingerprint and scoring settings;
+# least recently used entries are dropped past SCORE_CACHE_SIZE
+SCORE_CACHE_SIZE = 32
+score_cache = OrderedDict()
+
+class SelectionStats:
+    def __init__(self, bins: int = 16, edges=None):
+        # Per class: row count, feature sums and sums of squares, plus a (feature, bin, class) contingency
+        # table for mutual information. Everything adds up across chunks and worker processes
+        # as long as they share the bin edges.
+        self.bins = bins
+        self.features = None
+        self.classes = np.empty(0)
+        self.edges = edges
+        self.count = self.sums = self.squares = self.table = None
+        self.minimum = None
+
+    def _edges(self, X):
+        # Bin edges come from the first chunk: distinct values for discrete features, quantiles otherwise
+        edges = []
+        for column in X.T:
+            values = np.unique(column)
+            if len(values) > self.bins:
+                values = np.unique(np.quantile(column, np.linspace(0, 1, self.bins + 1)))
+            edges.append((values[:-1] + values[1:]) / 2)
+        return edges
+
+    def _grow(self, classes):
+        classes = np.union1d(self.classes, classes) if len(self.classes) else np.unique(classes)
+        if len(classes) == len(self.classes):
+            return
+        position = np.searchsorted(classes, self.classes)
+        grown = []
+        for state, axis in ((self.count, 0), (self.sums, 0), (self.squares, 0), (self.table, 2)):
+            shape = list(state.shape)
+            shape[axis] = len(classes)
+            new = np.zeros(shape, dtype=state.dtype)
+            index = [slice(None)] * len(shape)
+            index[axis] = position
+            new[tuple(index)] = state
+            grown.append(new)
+        self.count, self.sums, self.squares, self.table = grown
+        self.classes = classes
+
+    def update(self, df: pd.DataFrame, target: str = 'Test Results'):
+        numeric = df.select_dtypes(include=['number']).drop(columns=[target], errors='ignore')
+        X = numeric.to_numpy(dtype=np.float64)
+        classes, y = np.unique(df[target].to_numpy(), return_inverse=True)
+        if self.features is None:
+            self.features = list(numeric.columns)
+            self.edges = self._edges(X) if self.edges is None else self.edges
+            p = len(self.features)
+            self.count = np.zeros(0)
+            self.sums, self.squares = np.zeros((0, p)), np.zeros((0, p))
+            self.table = np.zeros((p, self.bins + 1, 0))
+            self.minimum = np.full(p, np.inf)
+        self._grow(classes)
+        y = np.searchsorted(self.classes, classes)[y]
+        k = len(self.classes)
+        onehot = np.zeros((len(y), k))
+        onehot[np.arange(len(y)), y] = 1
+        self.count += onehot.sum(axis=0)
+        self.sums += onehot.T @ X
+        self.squares += onehot.T @ (X * X)
+        self.minimum = np.minimum(self.minimum, X.min(axis=0, initial=np.inf))
+        # One bincount over (feature, bin, class) codes fills the contingency table for every feature
+        binned = np.stack([np.searchsorted(edges, column) for edges, column in zip(self.edges, X.T)], axis=1)
+        codes = (np.arange(X.shape[1]) * (self.bins + 1) + binned) * k + y[:, None]
+        self.table += np.bincount(codes.ravel(), minlength=self.table.size).reshape(self.table.shape)
+        return self
+
+    def merge(self, other: 'SelectionStats'):
+        if other.features is None:
+            return self
+        if self.features is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        self._grow(other.classes)
+        position = np.searchsorted(self.classes, other.classes)
+        self.count[position] += other.count
+        self.sums[position] += other.sums
+        self.squares[position] += other.squares
+        self.table[:, :, position] += other.table
+        self.minimum = np.minimum(self.minimum, other.minimum)
+        return self
+
+    def chi2(self) -> np.ndarray:
+        # sklearn's chi2 on class-wise feature sums; negative features (e.g. after FeatScale) are
+        # shifted to start at 0 instead of being rejected
+        shift = np.minimum(self.minimum, 0)
+        observed = self.sums - self.count[:, None] * shift
+        expected = np.outer(self.count / self.count.sum(), observed.sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return ((observed - expected) ** 2 / expected).sum(axis=0)
+
+    def anova(self) -> np.ndarray:
+        # One-way ANOVA F statistic, as f_classif computes it
+        n, k = self.count.sum(), len(self.count)
+        total = self.sums.sum(axis=0)
+        between = (self.sums ** 2 / self.count[:, None]).sum(axis=0) - total ** 2 / n
+        within = self.squares.sum(axis=0) - total ** 2 / n - between
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (between / (k - 1)) / (within / (n - k))
+
+    def mutual_info(self) -> np.ndarray:
+        # Mutual information (nats) between the binned feature and the class
+        joint = self.table / self.table.sum(axis=(1, 2), keepdims=True)
+        outer = joint.sum(axis=2, keepdims=True) * joint.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            terms = np.where(joint > 0, joint * np.log(joint / outer), 0.0)
+        return terms.sum(axis=(1, 2))
+
+    def scores(self, score_func: str) -> pd.Series:
+        return pd.Series({'chi2': self.chi2, 'anova': self.anova, 'mutual_info': self.mutual_info}[score_func](),
+                         index=self.features)
+
+def _chunk_stats(chunk, bins, edges, target):
+    return SelectionStats(bins, edges).update(chunk, target)
+
 class FeatSelect(Feature):
-    def feature_select(self, df: pd.DataFrame, threshold: float = 0.3):
-        df = df.select_dtypes(include=['number'])
-        X = df.drop(columns=['Test Results'])  
-        y = df['Test Results']
-        fs = SelectKBest(score_func=chi2, k='all')
-        
-        # Fit the selector to the data
-        fs.fit(X, y)
-        
-        # Display and store the feature scores
-        scores = fs.scores_
-        for feat in range(len(scores)):
-            print('Feature %d: %f' % (feat, scores[feat]))
-        
-        # Apply the threshold to filter important features
-        important_features = [X.columns[i] for i in range(len(scores)) if scores[i] > threshold]
-        
-        # Create a new DataFrame with only the important features
-        X_new = X[important_features]
-        print("Selected features:", important_features)
-        
-        # Combine the selected features with the target column
-        df_new = pd.concat([X_new, y], axis=1)
-        return df_new
-    
+    def __init__(self, score_func: str = 'chi2', threshold: float = 0.3, bins: int = 16,
+                 target: str = 'Test Results', cache_dir: str = None):
+        # score_func is 'chi2', 'anova' or 'mutual_info'; features scoring above threshold are kept
+        self.score_func = score_func
+        self.threshold = threshold
+        self.bins = bins
+        self.target = target
+        self.cache_dir = cache_dir
+
+    def _select(self, scores: pd.Series, threshold):
+        self.scores_ = scores
+        self.selected_features_ = list(scores.index[scores.to_numpy() > (self.threshold if threshold is None else threshold)])
+        print("Selected features:", self.selected_features_)
+        return self
+
+    def _cached_scores(self, df: pd.DataFrame) -> pd.Series:
+        numeric = df[[col for col in df.select_dtypes(include=['number']).columns if col != self.target] + [self.target]]
+        key = f"{frame_fingerprint(numeric)}-{self.score_func}-{self.bins}-{self.target}"
+        if key in score_cache:
+            score_cache.move_to_end(key)
+            return score_cache[key]
+        path = None if self.cache_dir is None else os.path.join(self.cache_dir, f"scores-{key}.json")
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                scores = pd.Series(json.load(f), dtype=np.float64)
+        else:
+            scores = SelectionStats(self.bins).update(numeric, self.target).scores(self.score_func)
+            if path is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(path, 'w') as f:
+                    json.dump(scores.to_dict(), f)
+        score_cache[key] = scores
+        while len(score_cache) > SCORE_CACHE_SIZE:
+            score_cache.popitem(last=False)
+        return scores
+
+    def fit(self, df: pd.DataFrame, threshold: float = None):
+        return self._select(self._cached_scores(df), threshold)
+
+    def fit_chunks(self, chunks, threshold: float = None, n_jobs: int = 1):
+        # Statistics per chunk, merged; with n_jobs > 1 chunks are counted on a process pool (-1 means all cores)
+        n_jobs = joblib.effective_n_jobs(n_jobs)
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            raise ValueError("fit_chunks needs at least one chunk")
+        stats = SelectionStats(self.bins).update(first, self.target)
+        if n_jobs == 1:
+            for chunk in chunks:
+                stats.update(chunk, self.target)
+        else:
+            # Workers bin with the edges taken from the first chunk. At most two chunks per worker are in
+            # flight, so only those are held in memory; results are merged as they complete
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                pending = set()
+                for chunk in chunks:
+                    if len(pending) >= 2 * n_jobs:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            stats.merge(future.result())
+                    pending.add(pool.submit(_chunk_stats, chunk, self.bins, stats.edges, self.target))
+                for future in pending:
+                    stats.merge(future.result())
+        return self._select(stats.scores(self.score_func), threshold)
+
+    def transform(self, df: pd.DataFrame):
+        # Selection at inference time is only a column projection
+        columns = self.selected_features_ + ([self.target] if self.target in df.columns else [])
+        return df[columns]
+
+    def feature_select(self, df: pd.DataFrame, threshold: float = None):
+        return self.fit(df, threshold).transform(df)
+
+    def save(self, filename='selected_features.json'):
+        with open(filename, 'w') as f:
+            json.dump({'selected_features': self.selected_features_, 'scores': self.scores_.to_dict()}, f)
+        print(f"Selected features saved to {filename}")
+        return filename
+
+    def load(self, filename='selected_features.json'):
+        with open(filename) as f:
+            saved = json.load(f)
+        self.selected_features_ = saved['selected_features']
+        self.scores_ = pd.Series(saved['scores'], dtype=np.float64)
+        return self
+
 class SelectionFactory:
-    def __init__(self, strategy : Feature):
+    def __init__(self, strategy : Feature, cache: StageCache = None):
         self.strategy = strategy
+        self.cache = cache
 
     def feature(self, df : pd.DataFrame):
-        return self.strategy.feature_select(df)
-    
+        return run_stage(self.cache, self.strategy, 'feature_select', df)
+
+    def fit(self, df : pd.DataFrame):
+        self.strategy.fit(df)
+        return self
+
+    def transform(self, df : pd.DataFrame):
+        return self.strategy.transform(df)
+
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    pass
@@ -1,6 +1,12 @@
+import json
+import os
+import numpy as np
 import pandas as pd
 from abc import ABC, abstractmethod
 from sklearn.model_selection import train_test_split
+from Preprocessing.caching import StageCache, run_stage
+
+SPLITS = ['train', 'test', 'validation']
 
 class Splitting(ABC):
     @abstractmethod
@@ -11,15 +17,218 @@ class TrainTestSplit(Splitting):
     def traintestsplit(self, df : pd.DataFrame):
         X = df.drop(['Test Results'], axis=1)
         y = df['Test Results']
-        X_train, y_train, X_test, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        return X_train, y_train, X_test, y_test
-    
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        return X_train, X_test, y_train, y_test
+
+class RowSplitter(Splitting):
+    # Assigns every row to train (0), test (1) or validation (2) from the row alone once fitted,
+    # so chunks can be split independently and nothing is shuffled
+    target = 'Test Results'
+
+    @abstractmethod
+    def assign(self, df: pd.DataFrame) -> np.ndarray:
+        pass
+
+    def fit_chunks(self, chunks):
+        return self
+
+    def fit(self, df: pd.DataFrame):
+        return self.fit_chunks([df])
+
+    def traintestsplit(self, df: pd.DataFrame):
+        # Same order as TrainTestSplit; X_val, y_val are appended when a validation split is configured
+        split = self.fit(df).assign(df)
+        X, y = df.drop(columns=[self.target]), df[self.target]
+        parts = [(X[split == code], y[split == code]) for code in range(3)]
+        result = (parts[0][0], parts[1][0], parts[0][1], parts[1][1])
+        return result + parts[2] if self.validation_size else result
+
+    def write(self, chunks, output_dir, feature_columns=None, dtype=np.float32) -> dict:
+        # chunks is a zero-argument callable returning a fresh iterator (fitting may need a pass of its own).
+        # Each split gets raw arrays for X, y and the original row positions, read back with load_split
+        # as memory maps, so training never holds a second copy of the data.
+        self.fit_chunks(chunks())
+        os.makedirs(output_dir, exist_ok=True)
+        files = {name: {part: open(os.path.join(output_dir, f"{name}_{part}.bin"), 'wb') for part in ('X', 'y', 'index')}
+                 for name in SPLITS}
+        rows = dict.fromkeys(SPLITS, 0)
+        offset, y_dtype, classes = 0, None, None
+        try:
+            for chunk in chunks():
+                if feature_columns is None:
+                    feature_columns = [col for col in chunk.select_dtypes(include=['number']).columns if col != self.target]
+                split = self.assign(chunk)
+                X = chunk[feature_columns].to_numpy(dtype=dtype)
+                y = chunk[self.target].to_numpy()
+                if classes is not None or y.dtype.kind not in 'biuf':
+                    # Non-numeric targets are stored as integer codes, the classes go to splits.json
+                    classes = list(dict.fromkeys([*(classes or []), *pd.unique(y)]))
+                    y = pd.Index(classes).get_indexer(y)
+                y_dtype = y_dtype or y.dtype.str
+                positions = np.arange(offset, offset + len(chunk), dtype=np.int64)
+                for code, name in enumerate(SPLITS):
+                    mask = split == code
+                    files[name]['X'].write(np.ascontiguousarray(X[mask]).tobytes())
+                    files[name]['y'].write(y[mask].astype(y_dtype).tobytes())
+                    files[name]['index'].write(positions[mask].tobytes())
+                    rows[name] += int(mask.sum())
+                offset += len(chunk)
+        finally:
+            for parts in files.values():
+                for f in parts.values():
+                    f.close()
+        meta = {'rows': rows, 'columns': feature_columns, 'X_dtype': np.dtype(dtype).str, 'y_dtype': y_dtype,
+                'classes': None if classes is None else [str(value) for value in classes]}
+        with open(os.path.join(output_dir, 'splits.json'), 'w') as f:
+            json.dump(meta, f)
+        print(f"Splits written to {output_dir}: {rows}")
+        return rows
+
+def load_split(output_dir, name: str = 'train'):
+    # Memory-mapped X, y and original row positions of one split written by RowSplitter.write;
+    # a non-numeric target is decoded from its codes into an in-memory array
+    with open(os.path.join(output_dir, 'splits.json')) as f:
+        meta = json.load(f)
+    n, width = meta['rows'][name], len(meta['columns'])
+    mapped = lambda part, dtype, shape: np.memmap(os.path.join(output_dir, f"{name}_{part}.bin"), dtype=dtype,
+                                                 mode='r', shape=shape) if n else np.empty(shape, dtype=dtype)
+    y = mapped('y', meta['y_dtype'], (n,))
+    if meta.get('classes') is not None:
+        y = np.asarray(meta['classes'], dtype=object)[y]
+    return mapped('X', meta['X_dtype'], (n, width)), y, mapped('index', np.int64, (n,))
+
+class HashSplit(RowSplitter):
+    def __init__(self, key: str, test_size: float = 0.2, validation_size: float = 0.0,
+                 stratify: str = None, salt: str = 'split'):
+        # key names the column (or list of columns) identifying a patient; there is no default because
+        # the dataset has no patient id column. Rows are placed by a salted hash of the key, so every row of a patient lands in the
+        # same split on every run and in every chunk. With stratify, patients are stratified by their most
+        # frequent class and per-class hash cutoffs are fitted in one pass, so a patient still gets one cutoff.
+        self.key = key
+        self.test_size = test_size
+        self.validation_size = validation_size
+        self.stratify = stratify
+        self.salt = salt
+        self.patients_ = None
+
+    def _hash(self, df: pd.DataFrame) -> np.ndarray:
+        missing = [col for col in ([self.key] if isinstance(self.key, str) else self.key) if col not in df.columns]
+        if missing:
+            raise ValueError(f"HashSplit key column(s) {missing} not found; pass key= a column identifying patients")
+        hashed = pd.util.hash_pandas_object(df[self.key], index=False).to_numpy()
+        salt = np.uint64(int.from_bytes(self.salt.encode()[:8].ljust(8, b'\0'), 'little'))
+        # Hash the key hash again with the salt mixed in
+        return pd.util.hash_array(hashed ^ salt)
+
+    @staticmethod
+    def _uniform(hashed: np.ndarray) -> np.ndarray:
+        # The top 53 bits give a uniform value in [0, 1)
+        return (hashed >> np.uint64(11)) * 2.0 ** -53
+
+    def fit_chunks(self, chunks):
+        if self.stratify is None:
+            return self
+        counts = None
+        for chunk in chunks:
+            part = pd.Series(1, index=pd.MultiIndex.from_arrays([self._hash(chunk), chunk[self.stratify].to_numpy()]))
+            part = part.groupby(level=[0, 1]).sum()
+            counts = part if counts is None else counts.add(part, fill_value=0)
+        if counts is None:
+            raise ValueError("HashSplit needs at least one chunk to fit on")
+        # Each patient belongs to one stratum: the class of most of its rows (ties go to the smallest class)
+        counts = counts.sort_index().sort_values(ascending=False, kind='mergesort')
+        strata = counts[~counts.index.get_level_values(0).duplicated()].index
+        patients = pd.Series(strata.get_level_values(1), index=strata.get_level_values(0))
+        cutoffs = {}
+        for stratum, group in patients.groupby(patients, sort=False):
+            u = np.sort(self._uniform(group.index.to_numpy(dtype=np.uint64)))
+            # u below the cutoff selects exactly the requested share of this stratum's patients
+            positions = np.round(np.array([self.test_size, self.test_size + self.validation_size]) * len(u)).astype(int)
+            cutoffs[stratum] = np.append(u, 1.0)[positions]
+        self.strata_ = pd.DataFrame(cutoffs, index=['test', 'validation']).T
+        self.patients_ = pd.Series(self.strata_.index.get_indexer(patients.to_numpy()), index=patients.index)
+        return self
+
+    def assign(self, df: pd.DataFrame) -> np.ndarray:
+        hashed = self._hash(df)
+        u = self._uniform(hashed)
+        if self.patients_ is None:
+            test, validation = self.test_size, self.test_size + self.validation_size
+        else:
+            # Patients not seen while fitting fall back to the plain proportions
+            position = self.patients_.index.get_indexer(hashed)
+            stratum = np.where(position >= 0, self.patients_.to_numpy()[position], -1)
+            cutoffs = np.vstack([self.strata_.to_numpy(), [self.test_size, self.test_size + self.validation_size]])
+            test, validation = cutoffs[stratum].T
+        return np.where(u < test, 1, np.where(u < validation, 2, 0))
+
+class TimeSplit(RowSplitter):
+    def __init__(self, date_column: str = 'Date of Admission', test_size: float = 0.2, validation_size: float = 0.0,
+                 test_start=None, validation_start=None):
+        # The most recent admissions form the test split and the period before them the validation split.
+        # Start dates can be given directly; otherwise they are fitted from the share of rows per day.
+        self.date_column = date_column
+        self.test_size = test_size
+        self.validation_size = validation_size
+        self.test_start = test_start
+        self.validation_start = validation_start
+
+    def _days(self, df: pd.DataFrame) -> pd.Series:
+        return pd.to_datetime(df[self.date_column], errors='coerce').dt.floor('D')
+
+    def fit_chunks(self, chunks):
+        if self.test_start is not None:
+            self.test_start_ = pd.Timestamp(self.test_start)
+            self.validation_start_ = pd.Timestamp(self.validation_start or self.test_start)
+            return self
+        counts = None
+        for chunk in chunks:
+            part = self._days(chunk).value_counts()
+            counts = part if counts is None else counts.add(part, fill_value=0)
+        if counts is None or counts.empty:
+            raise ValueError(f"TimeSplit needs at least one row with a valid '{self.date_column}' to fit on")
+        # Walk back from the latest day until the requested shares are covered
+        counts = counts.sort_index(ascending=False)
+        share = counts.cumsum() / counts.sum()
+        self.test_start_ = share.index[min(np.searchsorted(share.to_numpy(), self.test_size), len(share) - 1)]
+        if self.validation_size:
+            position = np.searchsorted(share.to_numpy(), self.test_size + self.validation_size)
+            self.validation_start_ = share.index[min(position, len(share) - 1)]
+        else:
+            self.validation_start_ = self.test_start_
+        return self
+
+    def assign(self, df: pd.DataFrame) -> np.ndarray:
+        # Rows without a parseable date stay in train
+        days = self._days(df)
+        return np.where(days >= self.test_start_, 1, np.where(days >= self.validation_start_, 2, 0))
+
 class TrainTestSplitFactory:
-    def __init__(self, strategy : Splitting):
+    def __init__(self, strategy : Splitting, cache: StageCache = None):
         self.strategy = strategy
+        self.cache = cache
 
     def splitting(self, df : pd.DataFrame):
-        return self.strategy.traintestsplit(df)
-    
+        return run_stage(self.cache, self.strategy, 'traintestsplit', df)
+
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    # Check: no patient lands in two splits, chunk by chunk, and the shares match the requested sizes
+    rng = np.random.default_rng(0)
+    n_rows = 100_000
+    data = pd.DataFrame({'Patient': rng.integers(0, 20_000, n_rows), 'Age': rng.integers(0, 90, n_rows),
+                         'Test Results': rng.choice(['Normal', 'Abnormal', 'Inconclusive'], n_rows),
+                         'Date of Admission': (pd.Timestamp('2020-01-01')
+                                               + pd.to_timedelta(rng.integers(0, 1500, n_rows), unit='D'))})
+    chunks = [data.iloc[i:i + 25_000] for i in range(0, n_rows, 25_000)]
+    for splitter in [HashSplit('Patient', validation_size=0.1),
+                     HashSplit('Patient', validation_size=0.1, stratify='Test Results')]:
+        splitter.fit_chunks(chunks)
+        split = np.concatenate([splitter.assign(chunk) for chunk in chunks])
+        assert (pd.Series(split).groupby(data['Patient'].to_numpy()).nunique() == 1).all()
+        shares = np.bincount(split, minlength=3) / n_rows
+        assert np.allclose(shares, [0.7, 0.2, 0.1], atol=0.02), shares
+    time_split = TimeSplit(validation_size=0.1).fit_chunks(chunks)
+    split = np.concatenate([time_split.assign(chunk) for chunk in chunks])
+    dates = data['Date of Admission']
+    assert dates[split == 0].max() < dates[split == 2].min() <= dates[split == 2].max() < dates[split == 1].min()
+    print("splits ok:", np.bincount(split, minlength=3))
@@ -0,0 +1,72 @@
+import sys
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+def max_rss_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+class ChunkedRunner:
+    def __init__(self, stages, chunksize: int = 100_000, memory_budget_mb: float = None):
+        # stages are callables taking and returning a DataFrame, e.g. PreparationFactory(...).prepare
+        # or the transform of an already fitted PreprocessingPipeline
+        self.stages = stages
+        self.chunksize = chunksize
+        self.memory_budget_mb = memory_budget_mb
+        self.stats = {}
+
+    def _chunksize_for(self, path, **read_csv_kwargs):
+        if self.memory_budget_mb is None:
+            return self.chunksize
+        # Size chunks from the in-memory footprint of a small sample of rows
+        sample = pd.read_csv(path, nrows=1000, **read_csv_kwargs)
+        bytes_per_row = max(sample.memory_usage(deep=True).sum() / max(len(sample), 1), 1)
+        return max(int(self.memory_budget_mb * 1024 ** 2 / bytes_per_row), 1)
+
+    def read(self, path, **read_csv_kwargs):
+        chunksize = self._chunksize_for(path, **read_csv_kwargs)
+        self.stats['chunksize'] = chunksize
+        with pd.read_csv(path, chunksize=chunksize, **read_csv_kwargs) as reader:
+            yield from reader
+
+    def transform(self, chunks):
+        for chunk in chunks:
+            for stage in self.stages:
+                chunk = stage(chunk)
+            yield chunk
+
+    def run(self, path, output_path, **read_csv_kwargs) -> dict:
+        self.stats = {'chunks': 0, 'rows': 0, 'peak_chunk_bytes': 0}
+        start = time.perf_counter()
+        writer = None
+        try:
+            for chunk in self.transform(self.read(path, **read_csv_kwargs)):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                # Every chunk becomes one row group of the output file
+                writer.write_table(table.cast(writer.schema))
+                self.stats['chunks'] += 1
+                self.stats['rows'] += len(chunk)
+                self.stats['peak_chunk_bytes'] = max(self.stats['peak_chunk_bytes'],
+                                                     int(chunk.memory_usage(deep=True).sum()))
+        finally:
+            if writer is not None:
+                writer.close()
+        self.stats['seconds'] = time.perf_counter() - start
+        self.stats['max_rss_bytes'] = max_rss_bytes()
+        print(f"Wrote {self.stats['rows']} rows in {self.stats['chunks']} chunks to {output_path}")
+        return self.stats
+
+if __name__ == "__main__":
+    pass